@@ -1,16 +1,49 @@
 """
 Flask application for Apache AGE Graph Database Management
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+import re
+import uuid
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, g
+from flask_caching import Cache
+from flask_compress import Compress
 from config import Config
 from utils.graph_utils import GraphUtils
 from utils.openai_helper import OpenAIHelper
+from utils.json_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config.from_object(Config)
+cache = Cache(app)
+Compress(app)
 
-# Initialize graph utilities without a specific graph
-graph_utils = GraphUtils(Config.DATABASE_URL)
+GRAPHS_CACHE_KEY = 'graphs_list'
+SCHEMA_CACHE_TIMEOUT = 300
+
+# Catalog version per graph, kept in the cache so a write invalidates the memoized schema.
+# With a shared backend (RedisCache) every worker reads the same version; with the default
+# per-process SimpleCache only the worker that handled the write sees the change.
+# Versions are random tokens, so a version key that gets evicted never maps back to old entries.
+CATALOG_VERSION_KEY = 'catalog_version:{}'
+
+# Endpoints that need a selected graph: pages redirect home, API calls get a 400
+GRAPH_PAGES = {'nodes', 'edges', 'graph', 'query'}
+GRAPH_API = {
+    'api_get_nodes', 'api_create_node', 'api_update_node', 'api_delete_node',
+    'api_get_edges', 'api_create_edge', 'api_update_edge', 'api_delete_edge',
+    'api_graph_data', 'api_translate_query', 'api_execute_cypher'
+}
+
+# Cypher clauses that can change a graph's schema
+WRITE_CLAUSE_RE = re.compile(r'\b(CREATE|MERGE|SET|REMOVE|DELETE)\b', re.IGNORECASE)
+
+# Initialize graph utilities without a specific graph, sharing one pooled engine across requests
+graph_utils = GraphUtils(
+    Config.DATABASE_URL,
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_recycle=Config.DB_POOL_RECYCLE
+)
 
 # Initialize OpenAI helper (only if Azure OpenAI is configured)
 openai_helper = None
@@ -26,12 +59,73 @@ if Config.AZURE_OPENAI_ENDPOINT and Config.AZURE_OPENAI_API_KEY:
     except Exception as e:
         print(f"Warning: Could not initialize Azure OpenAI helper: {e}")
 
+def get_graphs(refresh=False):
+    """List graphs, served from cache since the graph catalog rarely changes"""
+    result = None if refresh else cache.get(GRAPHS_CACHE_KEY)
+    if result is None:
+        result = graph_utils.list_graphs()
+        if result.get('success'):
+            cache.set(GRAPHS_CACHE_KEY, result)
+    return result
+
+def use_graph(graph_name):
+    """Point graph_utils at graph_name, at most once per request (g is request-scoped)"""
+    if g.get('current_graph_set') != graph_name:
+        graph_utils.set_graph(graph_name)
+        g.current_graph_set = graph_name
+
+def _is_valid_schema(schema):
+    """Only cache successfully generated schema summaries"""
+    return not schema.startswith('Error')
+
+@cache.memoize(timeout=SCHEMA_CACHE_TIMEOUT, response_filter=_is_valid_schema)
+def _schema_for(graph_name, catalog_version):
+    """Graph schema summary used as translation context, memoized per graph and catalog version"""
+    graph_utils.set_graph(graph_name)
+    # The version already says when to rebuild, so bypass the helper's own TTL cache
+    return openai_helper.get_graph_schema_summary(use_cache=False)
+
+def get_catalog_version(graph_name):
+    """Current catalog version of graph_name, shared by all workers when the cache backend is"""
+    key = CATALOG_VERSION_KEY.format(graph_name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() keeps the version of whichever worker got there first
+        if not cache.add(key, version, timeout=0):
+            version = cache.get(key) or version
+    return version
+
+def get_schema(graph_name):
+    """Schema summary for the current catalog version of graph_name"""
+    return _schema_for(graph_name, get_catalog_version(graph_name))
+
+def bump_catalog_version(graph_name):
+    """Record a write to graph_name; older memoized schema entries are no longer looked up by any worker"""
+    cache.set(CATALOG_VERSION_KEY.format(graph_name), uuid.uuid4().hex, timeout=0)
+
+@app.before_request
+def require_graph():
+    """Resolve the session's graph once for every endpoint that operates on it"""
+    if request.endpoint not in GRAPH_PAGES and request.endpoint not in GRAPH_API:
+        return None
+    
+    current_graph = session.get('graph_name')
+    if not current_graph:
+        if request.endpoint in GRAPH_API:
+            return jsonify({"error": "No graph selected"}), 400
+        flash('Please select a graph first', 'warning')
+        return redirect(url_for('index'))
+    
+    use_graph(current_graph)
+    g.current_graph = current_graph
+
 @app.route('/')
 def index():
     """Home page"""
     # Check if a graph is selected
     current_graph = session.get('graph_name')
-    graphs_result = graph_utils.list_graphs()
+    graphs_result = get_graphs()
     graphs = graphs_result.get('graphs', []) if graphs_result.get('success') else []
     
     return render_template('index.html', current_graph=current_graph, graphs=graphs)
@@ -39,49 +133,32 @@ def index():
 @app.route('/nodes')
 def nodes():
     """Page to create and view nodes"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        flash('Please select a graph first', 'warning')
-        return redirect(url_for('index'))
-    return render_template('nodes.html', current_graph=current_graph)
+    return render_template('nodes.html', current_graph=g.current_graph)
 
 @app.route('/edges')
 def edges():
     """Page to create and view edges"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        flash('Please select a graph first', 'warning')
-        return redirect(url_for('index'))
     # Get all nodes for the dropdown
-    graph_utils.set_graph(current_graph)
     nodes_result = graph_utils.get_all_nodes()
     nodes = nodes_result.get('result', []) if nodes_result.get('success') else []
-    return render_template('edges.html', nodes=nodes, current_graph=current_graph)
+    return render_template('edges.html', nodes=nodes, current_graph=g.current_graph)
 
 @app.route('/graph')
 def graph():
     """Graph visualization page"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        flash('Please select a graph first', 'warning')
-        return redirect(url_for('index'))
-    return render_template('graph.html', current_graph=current_graph)
+    return render_template('graph.html', current_graph=g.current_graph)
 
 @app.route('/query')
 def query():
     """Natural language query page"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        flash('Please select a graph first', 'warning')
-        return redirect(url_for('index'))
-    return render_template('query.html', current_graph=current_graph)
+    return render_template('query.html', current_graph=g.current_graph)
 
 # API Routes
 
 @app.route('/api/graphs', methods=['GET'])
 def api_list_graphs():
     """List all available graphs"""
-    result = graph_utils.list_graphs()
+    result = get_graphs()
     return jsonify(result)
 
 @app.route('/api/graphs', methods=['POST'])
@@ -94,6 +171,9 @@ def api_create_graph():
         return jsonify({"error": "graph_name is required"}), 400
     
     result = graph_utils.create_graph(graph_name)
+    if result.get('success'):
+        cache.delete(GRAPHS_CACHE_KEY)
+        bump_catalog_version(graph_name)
     return jsonify(result)
 
 @app.route('/api/graphs/select', methods=['POST'])
@@ -105,11 +185,13 @@ def api_select_graph():
     if not graph_name:
         return jsonify({"error": "graph_name is required"}), 400
     
-    # Verify graph exists
-    graphs_result = graph_utils.list_graphs()
+    # Verify graph exists (refresh the cached list once in case it was created by a script)
+    graphs_result = get_graphs()
+    if graph_name not in graphs_result.get('graphs', []):
+        graphs_result = get_graphs(refresh=True)
     if graphs_result.get('success') and graph_name in graphs_result.get('graphs', []):
         session['graph_name'] = graph_name
-        graph_utils.set_graph(graph_name)
+        use_graph(graph_name)
         return jsonify({"success": True, "message": f"Graph '{graph_name}' selected"})
     else:
         return jsonify({"error": f"Graph '{graph_name}' not found"}), 404
@@ -117,11 +199,6 @@ def api_select_graph():
 @app.route('/api/nodes', methods=['GET'])
 def api_get_nodes():
     """Get all nodes"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     label = request.args.get('label')
     result = graph_utils.get_all_nodes(label)
     return jsonify(result)
@@ -129,11 +206,6 @@ def api_get_nodes():
 @app.route('/api/nodes', methods=['POST'])
 def api_create_node():
     """Create a new node"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     data = request.json
     label = data.get('label')
     properties = data.get('properties', {})
@@ -142,16 +214,13 @@ def api_create_node():
         return jsonify({"error": "Label is required"}), 400
     
     result = graph_utils.create_node(label, properties)
+    if result.get('success'):
+        bump_catalog_version(g.current_graph)
     return jsonify(result)
 
 @app.route('/api/edges', methods=['GET'])
 def api_get_edges():
     """Get all edges"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     label = request.args.get('label')
     result = graph_utils.get_all_edges(label)
     return jsonify(result)
@@ -159,11 +228,6 @@ def api_get_edges():
 @app.route('/api/edges', methods=['POST'])
 def api_create_edge():
     """Create a new edge"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     data = request.json
     from_node_id = data.get('from_node_id')
     to_node_id = data.get('to_node_id')
@@ -174,16 +238,13 @@ def api_create_edge():
         return jsonify({"error": "from_node_id, to_node_id, and label are required"}), 400
     
     result = graph_utils.create_edge(from_node_id, to_node_id, label, properties)
+    if result.get('success'):
+        bump_catalog_version(g.current_graph)
     return jsonify(result)
 
 @app.route('/api/nodes/<int:node_id>', methods=['PUT'])
 def api_update_node(node_id):
     """Update a node"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     data = request.json
     properties = data.get('properties', {})
     
@@ -191,27 +252,21 @@ def api_update_node(node_id):
         return jsonify({"error": "Properties are required"}), 400
     
     result = graph_utils.update_node(node_id, properties)
+    if result.get('success'):
+        bump_catalog_version(g.current_graph)
     return jsonify(result)
 
 @app.route('/api/nodes/<int:node_id>', methods=['DELETE'])
 def api_delete_node(node_id):
     """Delete a node"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     result = graph_utils.delete_node(node_id)
+    if result.get('success'):
+        bump_catalog_version(g.current_graph)
     return jsonify(result)
 
 @app.route('/api/edges/<int:edge_id>', methods=['PUT'])
 def api_update_edge(edge_id):
     """Update an edge"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     data = request.json
     properties = data.get('properties', {})
     
@@ -219,27 +274,21 @@ def api_update_edge(edge_id):
         return jsonify({"error": "Properties are required"}), 400
     
     result = graph_utils.update_edge(edge_id, properties)
+    if result.get('success'):
+        bump_catalog_version(g.current_graph)
     return jsonify(result)
 
 @app.route('/api/edges/<int:edge_id>', methods=['DELETE'])
 def api_delete_edge(edge_id):
     """Delete an edge"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     result = graph_utils.delete_edge(edge_id)
+    if result.get('success'):
+        bump_catalog_version(g.current_graph)
     return jsonify(result)
 
 @app.route('/api/graph-data')
 def api_graph_data():
     """Get all graph data for visualization"""
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
     result = graph_utils.get_graph_data()
     return jsonify(result)
 
@@ -255,13 +304,10 @@ def api_translate_query():
     if not natural_query:
         return jsonify({"error": "query is required"}), 400
     
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
+    current_graph = g.current_graph
     
     # Get graph schema for context
-    graph_utils.set_graph(current_graph)
-    schema = openai_helper.get_graph_schema_summary()
+    schema = get_schema(current_graph)
     
     # Translate query (pass graph name so AI can include it in the query)
     result = openai_helper.natural_language_to_cypher(natural_query, schema, current_graph)
@@ -276,11 +322,7 @@ def api_execute_cypher():
     if not cypher_query:
         return jsonify({"error": "cypher is required"}), 400
     
-    current_graph = session.get('graph_name')
-    if not current_graph:
-        return jsonify({"error": "No graph selected"}), 400
-    
-    graph_utils.set_graph(current_graph)
+    current_graph = g.current_graph
     
     # Check if query already includes SELECT wrapper (complete AGE SQL)
     if cypher_query.strip().upper().startswith('SELECT'):
@@ -295,6 +337,9 @@ def api_execute_cypher():
         """
         result = graph_utils.execute_cypher(wrapped_query)
     
+    if result.get('success') and WRITE_CLAUSE_RE.search(cypher_query):
+        bump_catalog_version(current_graph)
+    
     return jsonify(result)
 
 if __name__ == '__main__':
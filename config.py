@@ -12,9 +12,14 @@ class Config:
     
     # Database Configuration
     DATABASE_URL = os.getenv('DATABASE_URL')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 20))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 40))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
     
     # AGE Configuration
     AGE_ENABLED = os.getenv('AGE_ENABLED', 'true').lower() == 'true'
+    # Rows sent per UNWIND statement by the batch node/edge helpers
+    AGE_BATCH_SIZE = int(os.getenv('AGE_BATCH_SIZE', 1000))
     
     # Azure OpenAI Configuration
     AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT', '')
@@ -22,6 +27,16 @@ class Config:
     AZURE_OPENAI_DEPLOYMENT = os.getenv('AZURE_OPENAI_DEPLOYMENT', 'gpt-4o')
     AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION', '2024-08-01-preview')
     
+    # Cache Configuration (SimpleCache is per process; several workers need a shared
+    # cache such as RedisCache so writes invalidate cached graph data for all of them)
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 60))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    
+    # Response Compression (gzip JSON/HTML payloads larger than COMPRESS_MIN_SIZE bytes)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    
     # Application Settings
     DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
     HOST = os.getenv('HOST', '0.0.0.0')
@@ -2,24 +2,91 @@
 Script to analyze all graphs and generate optimized indexes for Apache AGE
 Creates BTREE indexes for ID fields and GIN indexes for JSON properties
 """
-from sqlalchemy import create_engine, text
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import psycopg
+from psycopg import sql
 from config import Config
 
+# Number of tables indexed concurrently, each on its own connection
+INDEX_WORKERS = 8
+
+# (index name suffix, access method, column) created for every vertex/edge table
+VERTEX_INDEXES = [
+    ("id_btree_idx", "BTREE", "id"),
+    ("properties_gin_idx", "GIN", "properties"),
+]
+EDGE_INDEXES = [
+    ("id_btree_idx", "BTREE", "id"),
+    ("start_id_btree_idx", "BTREE", "start_id"),
+    ("end_id_btree_idx", "BTREE", "end_id"),
+    ("properties_gin_idx", "GIN", "properties"),
+]
+
+def create_table_indexes(graph_name, table, index_specs, existing_indexes):
+    """
+    Create the missing indexes of one table on a dedicated connection
+    
+    CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so the
+    connection is in autocommit mode. Tables are processed in parallel by
+    worker threads, so the report lines are returned instead of printed.
+    
+    A failed or interrupted CONCURRENTLY build leaves an INVALID index behind
+    under the same name; such indexes are dropped and built again.
+    
+    Args:
+        existing_indexes: Dictionary of index name to validity for this table
+    
+    Returns:
+        List of report lines
+    """
+    lines = []
+    try:
+        with psycopg.connect(Config.DATABASE_URL, autocommit=True) as conn:
+            for suffix, method, column in index_specs:
+                index_name = f"{table}_{suffix}"
+                if existing_indexes.get(index_name):
+                    lines.append(f"    ⊙ {method} index on {table}.{column} already exists")
+                    continue
+                
+                if index_name in existing_indexes:
+                    conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}.{};").format(
+                        sql.Identifier(graph_name),
+                        sql.Identifier(index_name)
+                    ))
+                    lines.append(f"    ↻ Dropped invalid {method} index on {table}.{column}, rebuilding")
+                
+                conn.execute(sql.SQL('''
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS {} 
+                    ON {}.{} 
+                    USING {} ({});
+                ''').format(
+                    sql.Identifier(index_name),
+                    sql.Identifier(graph_name),
+                    sql.Identifier(table),
+                    sql.SQL(method),
+                    sql.Identifier(column)
+                ))
+                lines.append(f"    ✓ Created {method} index on {table}.{column}")
+    except Exception as e:
+        lines.append(f"    ✗ Error creating indexes for {table}: {e}")
+    return lines
+
 def analyze_and_create_indexes():
     """Analyze all graphs and create recommended indexes"""
-    engine = create_engine(Config.DATABASE_URL)
-    
     print("=" * 80)
     print("Apache AGE Index Creation Script")
     print("=" * 80)
     
     try:
-        with engine.connect() as conn:
+        # Autocommit keeps this connection from holding a transaction open,
+        # which CREATE INDEX CONCURRENTLY in the workers would wait on
+        with psycopg.connect(Config.DATABASE_URL, autocommit=True) as conn:
             # Set search path
-            conn.execute(text("SET search_path = ag_catalog, '$user', public;"))
+            conn.execute("SET search_path = ag_catalog, '$user', public;")
             
             # Get all graphs
-            result = conn.execute(text("SELECT name FROM ag_graph;"))
+            result = conn.execute("SELECT name FROM ag_graph;")
             graphs = [row[0] for row in result.fetchall()]
             
             if not graphs:
@@ -35,23 +102,23 @@ def analyze_and_create_indexes():
                 
                 # Get all vertex labels (node types)
                 try:
-                    vertex_result = conn.execute(text(f"""
+                    vertex_result = conn.execute("""
                         SELECT table_name 
                         FROM information_schema.tables 
-                        WHERE table_schema = '{graph_name}'
-                        AND table_name LIKE '%\\_vertex'
+                        WHERE table_schema = %s
+                        AND table_name LIKE %s
                         AND table_type = 'BASE TABLE';
-                    """))
+                    """, (graph_name, '%\\_vertex'))
                     vertex_tables = [row[0] for row in vertex_result.fetchall()]
                     
                     # Get all edge labels (relationship types)
-                    edge_result = conn.execute(text(f"""
+                    edge_result = conn.execute("""
                         SELECT table_name 
                         FROM information_schema.tables 
-                        WHERE table_schema = '{graph_name}'
-                        AND table_name LIKE '%\\_edge'
+                        WHERE table_schema = %s
+                        AND table_name LIKE %s
                         AND table_type = 'BASE TABLE';
-                    """))
+                    """, (graph_name, '%\\_edge'))
                     edge_tables = [row[0] for row in edge_result.fetchall()]
                     
                     print(f"\n  Vertex tables found: {len(vertex_tables)}")
@@ -62,119 +129,41 @@ def analyze_and_create_indexes():
                     for table in edge_tables:
                         print(f"    • {table}")
                     
-                    # Create indexes for vertex tables
-                    if vertex_tables:
-                        print("\n  Creating indexes for VERTEX tables...")
-                        for table in vertex_tables:
-                            try:
-                                # Check if indexes already exist
-                                check_result = conn.execute(text(f"""
-                                    SELECT indexname 
-                                    FROM pg_indexes 
-                                    WHERE schemaname = '{graph_name}' 
-                                    AND tablename = '{table}';
-                                """))
-                                existing_indexes = [row[0] for row in check_result.fetchall()]
-                                
-                                # Create BTREE index on id
-                                btree_index_name = f"{table}_id_btree_idx"
-                                if btree_index_name not in existing_indexes:
-                                    conn.execute(text(f'''
-                                        CREATE INDEX "{btree_index_name}" 
-                                        ON "{graph_name}"."{table}" 
-                                        USING BTREE (id);
-                                    '''))
-                                    conn.commit()
-                                    print(f"    ✓ Created BTREE index on {table}.id")
-                                else:
-                                    print(f"    ⊙ BTREE index on {table}.id already exists")
-                                
-                                # Create GIN index on properties
-                                gin_index_name = f"{table}_properties_gin_idx"
-                                if gin_index_name not in existing_indexes:
-                                    conn.execute(text(f'''
-                                        CREATE INDEX "{gin_index_name}" 
-                                        ON "{graph_name}"."{table}" 
-                                        USING GIN (properties);
-                                    '''))
-                                    conn.commit()
-                                    print(f"    ✓ Created GIN index on {table}.properties")
-                                else:
-                                    print(f"    ⊙ GIN index on {table}.properties already exists")
-                                
-                            except Exception as e:
-                                print(f"    ✗ Error creating indexes for {table}: {e}")
-                                conn.rollback()
+                    # Check which indexes already exist (and are valid), once for the whole graph
+                    index_result = conn.execute("""
+                        SELECT t.relname, i.relname, x.indisvalid
+                        FROM pg_index x
+                        JOIN pg_class i ON i.oid = x.indexrelid
+                        JOIN pg_class t ON t.oid = x.indrelid
+                        JOIN pg_namespace n ON n.oid = t.relnamespace
+                        WHERE n.nspname = %s;
+                    """, (graph_name,))
+                    existing_indexes = defaultdict(dict)
+                    for tablename, indexname, is_valid in index_result.fetchall():
+                        existing_indexes[tablename][indexname] = is_valid
                     
-                    # Create indexes for edge tables
-                    if edge_tables:
-                        print("\n  Creating indexes for EDGE tables...")
-                        for table in edge_tables:
-                            try:
-                                # Check if indexes already exist
-                                check_result = conn.execute(text(f"""
-                                    SELECT indexname 
-                                    FROM pg_indexes 
-                                    WHERE schemaname = '{graph_name}' 
-                                    AND tablename = '{table}';
-                                """))
-                                existing_indexes = [row[0] for row in check_result.fetchall()]
-                                
-                                # Create BTREE index on id
-                                btree_id_index = f"{table}_id_btree_idx"
-                                if btree_id_index not in existing_indexes:
-                                    conn.execute(text(f'''
-                                        CREATE INDEX "{btree_id_index}" 
-                                        ON "{graph_name}"."{table}" 
-                                        USING BTREE (id);
-                                    '''))
-                                    conn.commit()
-                                    print(f"    ✓ Created BTREE index on {table}.id")
-                                else:
-                                    print(f"    ⊙ BTREE index on {table}.id already exists")
-                                
-                                # Create BTREE index on start_id
-                                btree_start_index = f"{table}_start_id_btree_idx"
-                                if btree_start_index not in existing_indexes:
-                                    conn.execute(text(f'''
-                                        CREATE INDEX "{btree_start_index}" 
-                                        ON "{graph_name}"."{table}" 
-                                        USING BTREE (start_id);
-                                    '''))
-                                    conn.commit()
-                                    print(f"    ✓ Created BTREE index on {table}.start_id")
-                                else:
-                                    print(f"    ⊙ BTREE index on {table}.start_id already exists")
-                                
-                                # Create BTREE index on end_id
-                                btree_end_index = f"{table}_end_id_btree_idx"
-                                if btree_end_index not in existing_indexes:
-                                    conn.execute(text(f'''
-                                        CREATE INDEX "{btree_end_index}" 
-                                        ON "{graph_name}"."{table}" 
-                                        USING BTREE (end_id);
-                                    '''))
-                                    conn.commit()
-                                    print(f"    ✓ Created BTREE index on {table}.end_id")
-                                else:
-                                    print(f"    ⊙ BTREE index on {table}.end_id already exists")
-                                
-                                # Create GIN index on properties
-                                gin_index_name = f"{table}_properties_gin_idx"
-                                if gin_index_name not in existing_indexes:
-                                    conn.execute(text(f'''
-                                        CREATE INDEX "{gin_index_name}" 
-                                        ON "{graph_name}"."{table}" 
-                                        USING GIN (properties);
-                                    '''))
-                                    conn.commit()
-                                    print(f"    ✓ Created GIN index on {table}.properties")
-                                else:
-                                    print(f"    ⊙ GIN index on {table}.properties already exists")
-                                
-                            except Exception as e:
-                                print(f"    ✗ Error creating indexes for {table}: {e}")
-                                conn.rollback()
+                    # Create indexes for all tables of the graph in parallel
+                    with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as executor:
+                        vertex_futures = [
+                            executor.submit(create_table_indexes, graph_name, table, VERTEX_INDEXES, existing_indexes[table])
+                            for table in vertex_tables
+                        ]
+                        edge_futures = [
+                            executor.submit(create_table_indexes, graph_name, table, EDGE_INDEXES, existing_indexes[table])
+                            for table in edge_tables
+                        ]
+                        
+                        # Create indexes for vertex tables
+                        if vertex_futures:
+                            print("\n  Creating indexes for VERTEX tables...")
+                            for future in vertex_futures:
+                                print("\n".join(future.result()))
+                        
+                        # Create indexes for edge tables
+                        if edge_futures:
+                            print("\n  Creating indexes for EDGE tables...")
+                            for future in edge_futures:
+                                print("\n".join(future.result()))
                     
                 except Exception as e:
                     print(f"  ✗ Error analyzing graph '{graph_name}': {e}")
@@ -1,7 +1,7 @@
 """
 Script to create a 'road' graph with 25 cities connected by highways and normal roads
 """
-import random
+import numpy as np
 from utils.graph_utils import GraphUtils
 from config import Config
 
@@ -35,27 +35,28 @@ def create_road_graph():
     # Set the active graph
     graph_utils.set_graph('road')
     
-    # Create city nodes
+    # One generator drives populations, connections and road parameters
+    rng = np.random.default_rng()
+    
+    # Create all city nodes in a single UNWIND round-trip
     print(f"\nCreating {len(cities)} city nodes...")
-    city_ids = {}
+    city_rows = [
+        {'name': city, 'population': population, 'state': 'USA'}
+        for city, population in zip(cities, rng.integers(50000, 5000001, size=len(cities)).tolist())
+    ]
     
-    for i, city in enumerate(cities, 1):
-        population = random.randint(50000, 5000000)
-        result = graph_utils.create_node('City', {
-            'name': city,
-            'population': population,
-            'state': 'USA'
-        })
-        
-        if result.get('success'):
-            # Extract node ID from result
-            node_data = result['result'][0][0].split('::')[0]
-            import json
-            node = json.loads(node_data)
-            city_ids[city] = node['id']
-            print(f"  ✓ Created {city} (ID: {node['id']}, Population: {population:,})")
-        else:
-            print(f"  ✗ Error creating {city}: {result.get('error')}")
+    populations = {row['name']: row['population'] for row in city_rows}
+    
+    # Only the IDs come back, in the order of the rows
+    result = graph_utils.create_nodes_batch('City', city_rows, return_id=True)
+    
+    if result.get('success'):
+        city_ids = dict(zip(cities, result['result']))
+        for city, node_id in city_ids.items():
+            print(f"  ✓ Created {city} (ID: {node_id}, Population: {populations[city]:,})")
+    else:
+        print(f"  ✗ Error creating cities: {result.get('error')}")
+        return
     
     # Create connections between cities
     print(f"\nCreating road connections...")
@@ -63,50 +64,58 @@ def create_road_graph():
     # Create a network of roads - each city connects to 2-4 other cities
     connections_created = 0
     road_types = ['Highway', 'Normal']
+    roads = {road_type: [] for road_type in road_types}
     
-    for city in cities:
-        if city not in city_ids:
+    # Pick 2-4 random target cities for each city
+    # (duplicate connections are not filtered out, for simplicity)
+    connections = []
+    for city, num_connections in zip(cities, rng.integers(2, 5, size=len(cities)).tolist()):
+        others = [c for c in cities if c != city]
+        target_cities = rng.choice(others, size=num_connections, replace=False).tolist()
+        connections.extend((city, target_city) for target_city in target_cities)
+    
+    # Generate realistic parameters for all roads at once, based on road type
+    n_roads = len(connections)
+    is_highway = rng.random(n_roads) < 0.5
+    km = np.where(
+        is_highway,
+        rng.integers(50, 501, size=n_roads),  # Highway: 50-500 km
+        rng.integers(20, 201, size=n_roads)   # Normal road: 20-200 km
+    )
+    speed = np.where(
+        is_highway,
+        rng.uniform(80, 120, size=n_roads),  # 80-120 km/h
+        rng.uniform(40, 60, size=n_roads)    # 40-60 km/h
+    )
+    time = np.round(km / speed, 1)
+    
+    # tolist() converts to plain Python numbers for the JSON parameter map
+    for (city, target_city), highway, road_km, road_time in zip(
+        connections, is_highway.tolist(), km.tolist(), time.tolist()
+    ):
+        road_type = 'Highway' if highway else 'Normal'
+        roads[road_type].append({
+            'from_id': city_ids[city],
+            'to_id': city_ids[target_city],
+            'km': road_km,
+            'time': road_time,
+            'from': city,
+            'to': target_city
+        })
+    
+    # Labels cannot be parameterized, so send one UNWIND batch per road type
+    for road_type, rows in roads.items():
+        if not rows:
             continue
-            
-        # Pick 2-4 random cities to connect to
-        num_connections = random.randint(2, 4)
-        target_cities = random.sample([c for c in cities if c != city], num_connections)
         
-        for target_city in target_cities:
-            if target_city not in city_ids:
-                continue
-            
-            # Check if connection already exists (avoid duplicates)
-            # For simplicity, we'll create connections anyway
-            
-            # Random road type
-            road_type = random.choice(road_types)
-            
-            # Generate realistic parameters based on road type
-            if road_type == 'Highway':
-                km = random.randint(50, 500)
-                time = round(km / random.uniform(80, 120), 1)  # 80-120 km/h
-            else:  # Normal road
-                km = random.randint(20, 200)
-                time = round(km / random.uniform(40, 60), 1)  # 40-60 km/h
-            
-            result = graph_utils.create_edge(
-                city_ids[city],
-                city_ids[target_city],
-                road_type,
-                {
-                    'km': km,
-                    'time': time,
-                    'from': city,
-                    'to': target_city
-                }
-            )
-            
-            if result.get('success'):
-                connections_created += 1
-                print(f"  ✓ {city} --[{road_type} {km}km, {time}h]--> {target_city}")
-            else:
-                print(f"  ✗ Error creating road from {city} to {target_city}: {result.get('error')}")
+        result = graph_utils.create_edges_batch(road_type, rows)
+        
+        if result.get('success'):
+            connections_created += len(result['result'])
+            for road in rows:
+                print(f"  ✓ {road['from']} --[{road_type} {road['km']}km, {road['time']}h]--> {road['to']}")
+        else:
+            print(f"  ✗ Error creating {road_type} roads: {result.get('error')}")
     
     print(f"\n{'='*60}")
     print(f"Graph creation completed!")
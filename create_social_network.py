@@ -7,7 +7,8 @@ Script to create a social network graph with:
 - Edges: WORKS_AT (Person -> Company)
 - Edges: FRIENDS, COWORKER (Person -> Person)
 """
-import random
+from collections import defaultdict
+import numpy as np
 from utils.graph_utils import GraphUtils
 from config import Config
 
@@ -63,6 +64,80 @@ COMPANIES = [
     "Mobile Technologies United"
 ]
 
+def create_nodes(graph_utils, label, rows):
+    """Create all nodes of one label in a single round-trip and return their IDs"""
+    result = graph_utils.create_nodes_batch(label, rows, return_id=True)
+    if not result.get("success"):
+        print(f"  Error creating {label} nodes: {result.get('error')}")
+        return []
+    return result["result"]
+
+def create_edges(graph_utils, label, pairs, merge=False, parallel=False):
+    """Create all edges of one label and return how many were created"""
+    if parallel:
+        result = graph_utils.create_edges_parallel(label, pairs, merge=merge)
+    else:
+        result = graph_utils.create_edges_batch(label, pairs, merge=merge)
+    if not result.get("success"):
+        print(f"  Error creating {label} edges: {result.get('error')}")
+        return 0
+    return len(result["result"])
+
+def sample_targets(rng, source_ids, target_ids, counts):
+    """Pick counts[i] distinct targets for each source and return the (source, target) pairs"""
+    return [
+        (source_id, target_id)
+        for source_id, count in zip(source_ids, counts.tolist())
+        for target_id in rng.choice(target_ids, size=count, replace=False).tolist()
+    ]
+
+def sample_others(rng, ids, index, count):
+    """Pick up to count distinct IDs other than ids[index], sampling indices instead of copying the list"""
+    count = min(count, len(ids) - 1)
+    # One spare draw covers the case where index itself is picked
+    picks = rng.choice(len(ids), size=count + 1, replace=False)
+    return [ids[i] for i in picks[picks != index][:count].tolist()]
+
+def edge_rows(pairs, **properties):
+    """Zip (from_id, to_id) pairs with per-edge property arrays into create_edges_batch rows"""
+    names = list(properties)
+    columns = [values.tolist() for values in properties.values()]
+    return [
+        {"from_id": from_id, "to_id": to_id, **dict(zip(names, values))}
+        for (from_id, to_id), *values in zip(pairs, *columns)
+    ]
+
+def create_sport_edges(graph_utils, practice_pairs, like_pairs):
+    """MERGE the PRACTICE and LIKE edges in one round-trip and return how many were written"""
+    if not practice_pairs or not like_pairs:
+        # An empty UNWIND would swallow the other label's count, so send them separately
+        return (create_edges(graph_utils, "PRACTICE", practice_pairs, merge=True)
+                + create_edges(graph_utils, "LIKE", like_pairs, merge=True))
+    
+    # Both UNWINDs share one query; the aggregating WITH collapses the PRACTICE
+    # rows back to one before the LIKE pass. MERGE keeps re-runs from stacking
+    # duplicate Person -> Sport edges.
+    result = graph_utils.execute_cypher_params("""
+        UNWIND $practice AS p
+        MATCH (a), (b)
+        WHERE id(a) = p.from_id AND id(b) = p.to_id
+        MERGE (a)-[r:PRACTICE]->(b)
+        SET r.years = p.years, r.skill_level = p.skill_level
+        WITH count(r) AS practice_count
+        UNWIND $like AS l
+        MATCH (a), (b)
+        WHERE id(a) = l.from_id AND id(b) = l.to_id
+        MERGE (a)-[r:LIKE]->(b)
+        SET r.interest_level = l.interest_level
+        WITH practice_count, count(r) AS like_count
+        RETURN practice_count + like_count
+    """, {"practice": practice_pairs, "like": like_pairs}, "edge_count agtype", "(edge_count::text)::bigint")
+    
+    if not result.get("success"):
+        print(f"  Error creating PRACTICE/LIKE edges: {result.get('error')}")
+        return 0
+    return result["result"][0][0] if result["result"] else 0
+
 def create_social_network():
     """Create a comprehensive social network graph"""
     
@@ -76,197 +151,153 @@ def create_social_network():
         return
     
     graph_utils.set_graph("social_network")
+    
+    # Index the label tables first so the edge MATCHes on id() do not scan them
+    result = graph_utils.create_label_indexes(
+        ["Person", "Sport", "Company"],
+        ["PRACTICE", "LIKE", "WORKS_AT", "FRIENDS", "COWORKER"]
+    )
+    if "error" in result:
+        print(f"Error creating label indexes: {result['error']}")
+        return
     print("Graph 'social_network' is ready.\n")
     
-    # Create 100 Person nodes
-    print("Creating 100 Person nodes...")
-    person_ids = []
-    for i in range(100):
-        first_name = random.choice(FIRST_NAMES)
-        last_name = random.choice(LAST_NAMES)
-        name = f"{first_name} {last_name}"
-        age = random.randint(22, 65)
-        city = random.choice(CITIES)
+    # All random data is drawn in bulk from one generator
+    rng = np.random.default_rng()
+    
+    # Write the nodes and their Sport/Company edges in one transaction, committed once
+    graph_utils.begin_bulk()
+    try:
+        # Create 100 Person nodes
+        print("Creating 100 Person nodes...")
+        num_persons = 100
+        person_rows = [
+            {"name": f"{first_name} {last_name}", "age": age, "city": city}
+            for first_name, last_name, age, city in zip(
+                rng.choice(FIRST_NAMES, size=num_persons).tolist(),
+                rng.choice(LAST_NAMES, size=num_persons).tolist(),
+                rng.integers(22, 66, size=num_persons).tolist(),
+                rng.choice(CITIES, size=num_persons).tolist()
+            )
+        ]
+        person_ids = create_nodes(graph_utils, "Person", person_rows)
+        print(f"✓ Created {len(person_ids)} Person nodes\n")
         
-        result = graph_utils.create_node("Person", {
-            "name": name,
-            "age": age,
-            "city": city
-        })
+        # Create 10 Sport nodes
+        print("Creating 10 Sport nodes...")
+        sport_rows = [
+            {
+                "name": sport,
+                "category": "Outdoor" if sport in ["Soccer", "Running", "Cycling", "Golf"] else "Indoor"
+            }
+            for sport in SPORTS
+        ]
+        sport_ids = create_nodes(graph_utils, "Sport", sport_rows)
+        print(f"✓ Created {len(sport_ids)} Sport nodes\n")
         
-        if result.get("success"):
-            # Extract node ID from result
-            import json
-            node_str = result["result"][0][0].split('::')[0].strip()
-            node_data = json.loads(node_str)
-            person_ids.append(node_data['id'])
-            
-            if (i + 1) % 20 == 0:
-                print(f"  Created {i + 1} persons...")
-        else:
-            print(f"  Error creating person: {result.get('error')}")
-    
-    print(f"✓ Created {len(person_ids)} Person nodes\n")
-    
-    # Create 10 Sport nodes
-    print("Creating 10 Sport nodes...")
-    sport_ids = []
-    for sport in SPORTS:
-        result = graph_utils.create_node("Sport", {
-            "name": sport,
-            "category": "Outdoor" if sport in ["Soccer", "Running", "Cycling", "Golf"] else "Indoor"
-        })
+        # Create 10 Company nodes
+        print("Creating 10 Company nodes...")
+        company_rows = [
+            {"name": company, "employees": employees, "industry": industry}
+            for company, employees, industry in zip(
+                COMPANIES,
+                rng.integers(50, 501, size=len(COMPANIES)).tolist(),
+                rng.choice(["Technology", "Finance", "Healthcare", "Retail", "Manufacturing"], size=len(COMPANIES)).tolist()
+            )
+        ]
+        company_ids = create_nodes(graph_utils, "Company", company_rows)
+        print(f"✓ Created {len(company_ids)} Company nodes\n")
         
-        if result.get("success"):
-            import json
-            node_str = result["result"][0][0].split('::')[0].strip()
-            node_data = json.loads(node_str)
-            sport_ids.append(node_data['id'])
-    
-    print(f"✓ Created {len(sport_ids)} Sport nodes\n")
-    
-    # Create 10 Company nodes
-    print("Creating 10 Company nodes...")
-    company_ids = []
-    for company in COMPANIES:
-        result = graph_utils.create_node("Company", {
-            "name": company,
-            "employees": random.randint(50, 500),
-            "industry": random.choice(["Technology", "Finance", "Healthcare", "Retail", "Manufacturing"])
-        })
+        # Create PRACTICE and LIKE edges (Person -> Sport)
+        print("Creating Person -> Sport relationships...")
+        # Each person practices 1-3 sports and likes 1-4 sports (may overlap with practiced)
+        practiced = sample_targets(rng, person_ids, sport_ids, rng.integers(1, 4, size=len(person_ids)))
+        liked = sample_targets(rng, person_ids, sport_ids, rng.integers(1, 5, size=len(person_ids)))
         
-        if result.get("success"):
-            import json
-            node_str = result["result"][0][0].split('::')[0].strip()
-            node_data = json.loads(node_str)
-            company_ids.append(node_data['id'])
-    
-    print(f"✓ Created {len(company_ids)} Company nodes\n")
-    
-    # Create PRACTICE and LIKE edges (Person -> Sport)
-    print("Creating Person -> Sport relationships...")
-    sport_edges = 0
-    for person_id in person_ids:
-        # Each person practices 1-3 sports
-        num_practice = random.randint(1, 3)
-        practiced_sports = random.sample(sport_ids, num_practice)
+        # Never send the same (person, sport) pair twice for one label
+        practiced = list(dict.fromkeys(practiced))
+        liked = list(dict.fromkeys(liked))
         
-        for sport_id in practiced_sports:
-            result = graph_utils.create_edge(
-                person_id, sport_id, "PRACTICE",
-                {
-                    "years": random.randint(1, 20),
-                    "skill_level": random.choice(["Beginner", "Intermediate", "Advanced", "Expert"])
-                }
-            )
-            if result.get("success"):
-                sport_edges += 1
+        practice_pairs = edge_rows(
+            practiced,
+            years=rng.integers(1, 21, size=len(practiced)),
+            skill_level=rng.choice(["Beginner", "Intermediate", "Advanced", "Expert"], size=len(practiced))
+        )
+        like_pairs = edge_rows(
+            liked,
+            interest_level=rng.integers(1, 11, size=len(liked))
+        )
         
-        # Each person likes 1-4 sports (may overlap with practiced)
-        num_like = random.randint(1, 4)
-        liked_sports = random.sample(sport_ids, num_like)
+        sport_edges = create_sport_edges(graph_utils, practice_pairs, like_pairs)
+        print(f"✓ Created {sport_edges} Person->Sport relationships (PRACTICE, LIKE)\n")
         
-        for sport_id in liked_sports:
-            result = graph_utils.create_edge(
-                person_id, sport_id, "LIKE",
-                {
-                    "interest_level": random.randint(1, 10)
-                }
-            )
-            if result.get("success"):
-                sport_edges += 1
-    
-    print(f"✓ Created {sport_edges} Person->Sport relationships (PRACTICE, LIKE)\n")
-    
-    # Create WORKS_AT edges (Person -> Company)
-    print("Creating Person -> Company relationships...")
-    work_edges = 0
-    for person_id in person_ids:
+        # Create WORKS_AT edges (Person -> Company)
+        print("Creating Person -> Company relationships...")
         # Each person works at one company
-        company_id = random.choice(company_ids)
-        result = graph_utils.create_edge(
-            person_id, company_id, "WORKS_AT",
-            {
-                "position": random.choice(["Engineer", "Manager", "Analyst", "Designer", "Developer", "Consultant"]),
-                "years": random.randint(1, 15),
-                "salary": random.randint(50000, 150000)
-            }
+        person_to_company = dict(zip(person_ids, rng.choice(company_ids, size=len(person_ids)).tolist()))
+        works_at_pairs = edge_rows(
+            list(person_to_company.items()),
+            position=rng.choice(["Engineer", "Manager", "Analyst", "Designer", "Developer", "Consultant"], size=len(person_ids)),
+            years=rng.integers(1, 16, size=len(person_ids)),
+            salary=rng.integers(50000, 150001, size=len(person_ids))
         )
-        if result.get("success"):
-            work_edges += 1
+        work_edges = create_edges(graph_utils, "WORKS_AT", works_at_pairs)
+        print(f"✓ Created {work_edges} Person->Company relationships (WORKS_AT)\n")
+        
+    except Exception:
+        graph_utils.end_bulk(commit=False)
+        raise
     
-    print(f"✓ Created {work_edges} Person->Company relationships (WORKS_AT)\n")
+    result = graph_utils.end_bulk()
+    if "error" in result:
+        print(f"Error creating social network: {result['error']}")
+        return
     
     # Create FRIENDS edges (Person -> Person)
+    # These are spread over several connections, which only see the nodes
+    # once the bulk write above has been committed
     print("Creating Person -> Person FRIENDS relationships...")
-    friends_edges = 0
-    for person_id in person_ids:
+    friendships = []
+    for index, num_friends in enumerate(rng.integers(3, 9, size=len(person_ids)).tolist()):
         # Each person has 3-8 friends
-        num_friends = random.randint(3, 8)
         # Avoid self-friendship and ensure unique friends
-        possible_friends = [pid for pid in person_ids if pid != person_id]
-        friends = random.sample(possible_friends, min(num_friends, len(possible_friends)))
-        
-        for friend_id in friends:
-            result = graph_utils.create_edge(
-                person_id, friend_id, "FRIENDS",
-                {
-                    "since": random.randint(2010, 2024),
-                    "closeness": random.randint(1, 10)
-                }
-            )
-            if result.get("success"):
-                friends_edges += 1
+        friends = sample_others(rng, person_ids, index, num_friends)
+        friendships.extend((person_ids[index], friend_id) for friend_id in friends)
     
+    friends_pairs = edge_rows(
+        friendships,
+        since=rng.integers(2010, 2025, size=len(friendships)),
+        closeness=rng.integers(1, 11, size=len(friendships))
+    )
+    friends_edges = create_edges(graph_utils, "FRIENDS", friends_pairs, parallel=True)
     print(f"✓ Created {friends_edges} Person->Person relationships (FRIENDS)\n")
     
     # Create COWORKER edges (Person -> Person)
     # Group people by company and create coworker relationships
     print("Creating Person -> Person COWORKER relationships...")
-    coworker_edges = 0
     
-    # First, group people by company
-    company_employees = {}
-    for person_id in person_ids:
-        # Find which company this person works at
-        result = graph_utils.execute_cypher(f"""
-            SELECT * FROM cypher('social_network', $$
-                MATCH (p)-[w:WORKS_AT]->(c:Company)
-                WHERE id(p) = {person_id}
-                RETURN c
-            $$) as (company agtype);
-        """)
-        
-        if result.get("success") and result.get("result"):
-            import json
-            company_str = result["result"][0][0].split('::')[0].strip()
-            company_data = json.loads(company_str)
-            company_id = company_data['id']
-            
-            if company_id not in company_employees:
-                company_employees[company_id] = []
-            company_employees[company_id].append(person_id)
+    # The WORKS_AT assignment is already known here, so group employees by company
+    # locally instead of reading the edges back
+    company_employees = defaultdict(list)
+    for person_id, company_id in person_to_company.items():
+        company_employees[company_id].append(person_id)
     
     # Create coworker relationships within each company
-    for company_id, employees in company_employees.items():
-        if len(employees) > 1:
-            # Each person is coworker with 2-5 others in the same company
-            for person_id in employees:
-                num_coworkers = min(random.randint(2, 5), len(employees) - 1)
-                possible_coworkers = [pid for pid in employees if pid != person_id]
-                coworkers = random.sample(possible_coworkers, min(num_coworkers, len(possible_coworkers)))
-                
-                for coworker_id in coworkers:
-                    result = graph_utils.create_edge(
-                        person_id, coworker_id, "COWORKER",
-                        {
-                            "department": random.choice(["Engineering", "Sales", "Marketing", "HR", "Operations"]),
-                            "collaboration_score": random.randint(1, 10)
-                        }
-                    )
-                    if result.get("success"):
-                        coworker_edges += 1
+    coworkerships = []
+    for employees in company_employees.values():
+        if len(employees) < 2:
+            continue
+        # Each person is coworker with 2-5 others in the same company
+        for index, num_coworkers in enumerate(rng.integers(2, 6, size=len(employees)).tolist()):
+            coworkers = sample_others(rng, employees, index, num_coworkers)
+            coworkerships.extend((employees[index], coworker_id) for coworker_id in coworkers)
     
+    coworker_pairs = edge_rows(
+        coworkerships,
+        department=rng.choice(["Engineering", "Sales", "Marketing", "HR", "Operations"], size=len(coworkerships)),
+        collaboration_score=rng.integers(1, 11, size=len(coworkerships))
+    )
+    coworker_edges = create_edges(graph_utils, "COWORKER", coworker_pairs, merge=True, parallel=True)
     print(f"✓ Created {coworker_edges} Person->Person relationships (COWORKER)\n")
     
     # Summary
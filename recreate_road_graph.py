@@ -3,7 +3,8 @@ Script to drop and recreate the road graph with proper numeric values
 """
 from utils.graph_utils import GraphUtils
 from config import Config
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from utils.db import get_engine
 
 # Initialize graph utilities
 graph_utils = GraphUtils(Config.DATABASE_URL)
@@ -12,15 +13,19 @@ def drop_road_graph():
     """Drop the road graph if it exists"""
     print("Dropping 'road' graph if it exists...")
     try:
-        engine = create_engine(Config.DATABASE_URL)
+        engine = get_engine(Config.DATABASE_URL)
         with engine.connect() as conn:
             conn.execute(text("SET search_path = ag_catalog, '$user', public;"))
             conn.execute(text("SELECT drop_graph('road', true);"))
             conn.commit()
             print("✓ Graph 'road' dropped successfully")
     except Exception as e:
-        print(f"Note: {e}")
-        print("(This is normal if the graph doesn't exist)")
+        # drop_graph's second argument cascades to the label tables; it does not
+        # make the call a no-op for a missing graph, so that error is expected
+        if "does not exist" in str(e):
+            print("Graph 'road' does not exist, nothing to drop")
+        else:
+            print(f"Note: {e}")
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,32 @@
+"""
+Shared SQLAlchemy engines for the app and the graph scripts
+"""
+from functools import lru_cache
+from sqlalchemy import create_engine
+
+def get_engine(database_url, pool_size=5, max_overflow=10, pool_recycle=1800):
+    """
+    Get the engine for a database URL, creating it on first use
+    
+    Args:
+        database_url: SQLAlchemy database URL
+        pool_size: Connections kept open in the pool
+        max_overflow: Extra connections allowed under load
+        pool_recycle: Seconds after which a pooled connection is replaced
+    
+    Returns:
+        SQLAlchemy engine shared by every caller with the same settings
+    """
+    # Normalize to positional arguments so keyword and positional calls share an entry
+    return _get_engine(database_url, pool_size, max_overflow, pool_recycle)
+
+@lru_cache(maxsize=None)
+def _get_engine(database_url, pool_size, max_overflow, pool_recycle):
+    # pool_pre_ping transparently replaces connections dropped by PgBouncer or idle timeouts
+    return create_engine(
+        database_url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=pool_recycle
+    )
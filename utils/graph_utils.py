@@ -1,16 +1,161 @@
 """
 Graph utility functions for Apache AGE operations
 """
-from sqlalchemy import create_engine, text
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import orjson
+from sqlalchemy import text
 from config import Config
+from utils.db import get_engine
+
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_AGTYPE_RE = re.compile(r'^(.*)::(?:vertex|edge|path)\s*$', re.S)
+
+# Upper bound on cached query shapes; caller-chosen property keys could otherwise grow the caches forever
+_STATEMENT_CACHE_SIZE = 512
+
+# Errors that only mean a concurrent writer got in the way, so the write can be retried
+_RETRYABLE_ERRORS = ('deadlock detected', 'could not serialize access')
+
+def parse_agtype(value):
+    """
+    Parse an agtype value returned by AGE
+    
+    Args:
+        value: agtype text, e.g. '{"id": 1, "label": "City", "properties": {...}}::vertex'
+    
+    Returns:
+        Parsed value (a dictionary for vertices and edges)
+    """
+    match = _AGTYPE_RE.match(value)
+    return orjson.loads(match.group(1) if match else value)
+
+def cypher_key(key):
+    """Render a property key, backtick-quoting it unless it is a plain identifier"""
+    return key if _IDENTIFIER_RE.match(key) else f"`{key.replace('`', '``')}`"
 
 class GraphUtils:
     """Utility class for AGE graph operations"""
     
-    def __init__(self, database_url, graph_name=None):
-        self.engine = create_engine(database_url)
-        self.graph_name = graph_name
+    def __init__(self, database_url, graph_name=None, pool_size=5, max_overflow=10, pool_recycle=1800):
+        # Instances created with the same settings share one engine and connection pool
+        self.engine = get_engine(database_url, pool_size, max_overflow, pool_recycle)
+        # The active graph is tracked per thread (per greenlet under gevent) because
+        # the web app shares one GraphUtils instance across concurrent requests
+        self._local = threading.local()
+        self._default_graph_name = graph_name
+        # Cypher bodies keyed by query shape, and prepared statement SQL keyed by graph and body
+        self._cypher_cache = {}
+        self._statement_cache = {}
         self.age_enabled = Config.AGE_ENABLED
+        self.batch_size = Config.AGE_BATCH_SIZE
+    
+    @property
+    def graph_name(self):
+        """Name of the active graph for the current thread"""
+        return getattr(self._local, 'graph_name', self._default_graph_name)
+    
+    @contextmanager
+    def _connection(self):
+        """Yield the connection of the current bulk write, or a new one that commits on exit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                yield conn
+            except Exception as e:
+                # The bulk transaction is now aborted; remember why so end_bulk() rolls it back
+                if not self._local.bulk_error:
+                    self._local.bulk_error = str(e)
+                raise
+            return
+        
+        with self.engine.connect() as conn:
+            # Set the search path to include ag_catalog
+            conn.execute(text("SET search_path = ag_catalog, '$user', public;"))
+            yield conn
+            conn.commit()
+    
+    def begin_bulk(self):
+        """
+        Start a bulk write on the current thread
+        
+        Every query issued until end_bulk() runs on one connection inside one
+        transaction, so the whole ingest is flushed with a single commit.
+        
+        Returns:
+            The shared SQLAlchemy connection
+        """
+        conn = self.engine.connect()
+        try:
+            conn.execute(text("SET search_path = ag_catalog, '$user', public;"))
+        except Exception:
+            conn.close()
+            raise
+        self._local.conn = conn
+        self._local.bulk_error = None
+        # Statements prepared by this bulk write, deallocated again before it commits
+        self._local.prepared = set()
+        return conn
+    
+    def end_bulk(self, commit=True):
+        """
+        Finish the bulk write started by begin_bulk() and release its connection
+        
+        Args:
+            commit: Commit the transaction; it is rolled back instead if False
+                    or if any query of the bulk write failed
+        
+        Returns:
+            Dictionary with success status
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return {"error": "No bulk write in progress"}
+        
+        error = self._local.bulk_error
+        prepared = self._local.prepared
+        self._local.conn = None
+        self._local.bulk_error = None
+        self._local.prepared = set()
+        
+        try:
+            if commit and not error:
+                # Leave nothing behind on the backend, which a transaction pooler may hand to another client
+                with conn.connection.cursor() as cursor:
+                    for statement_name in prepared:
+                        cursor.execute(f"DEALLOCATE {statement_name}")
+                conn.commit()
+                return {"success": True}
+            conn.rollback()
+            self._discard_statements(conn, prepared)
+            return {"error": f"Bulk write rolled back: {error}" if error else "Bulk write rolled back"}
+        except Exception as e:
+            conn.rollback()
+            self._discard_statements(conn, prepared)
+            return {"error": str(e)}
+        finally:
+            conn.close()
+    
+    def _discard_statements(self, conn, statement_names):
+        """
+        DEALLOCATE statements a rolled back transaction left behind, as far as possible
+        
+        Prepared statements survive a rollback. Each name is dropped in its own
+        transaction; a name that is not there (e.g. a pooler moved the client to
+        another backend) is skipped, and pg_prepared_statements covers reuse of the rest.
+        """
+        dbapi_conn = conn.connection
+        for statement_name in statement_names:
+            try:
+                with dbapi_conn.cursor() as cursor:
+                    cursor.execute(f"DEALLOCATE {statement_name}")
+                dbapi_conn.commit()
+            except Exception:
+                dbapi_conn.rollback()
     
     def execute_cypher(self, cypher_query, params=None):
         """Execute a Cypher query using AGE"""
@@ -21,10 +166,7 @@ class GraphUtils:
             return {"error": "No graph selected"}
         
         try:
-            with self.engine.connect() as conn:
-                # Set the search path to include ag_catalog
-                conn.execute(text("SET search_path = ag_catalog, '$user', public;"))
-                
+            with self._connection() as conn:
                 # Execute the Cypher query without parameter substitution
                 # The text() function with no params will treat the query as-is
                 if params:
@@ -32,7 +174,6 @@ class GraphUtils:
                 else:
                     # Use raw connection to avoid bind parameter interpretation
                     result = conn.exec_driver_sql(cypher_query)
-                conn.commit()
                 
                 # Convert Row objects to lists for JSON serialization
                 rows = result.fetchall()
@@ -42,43 +183,224 @@ class GraphUtils:
         except Exception as e:
             return {"error": str(e)}
     
-    def create_node(self, label, properties):
+    def _cypher_template(self, key, build):
+        """
+        Return the Cypher body for a query shape, building it only on first use
+        
+        Args:
+            key: Query shape, e.g. ('create_node', label, return_id)
+            build: Callable producing the Cypher body for that shape
+        
+        Returns:
+            Cypher body string (the same object for every call with this key)
+        """
+        cypher = self._cypher_cache.get(key)
+        if cypher is None:
+            if len(self._cypher_cache) >= _STATEMENT_CACHE_SIZE:
+                self._cypher_cache.clear()
+            cypher = self._cypher_cache[key] = build()
+        return cypher
+    
+    def _chunks(self, items, chunk_size=None):
+        """Split a batch so no single UNWIND payload grows past chunk_size items"""
+        chunk_size = chunk_size or self.batch_size
+        return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    
+    def _execute_chunks(self, cypher_body, param_name, items, columns, chunk_size=None):
+        """
+        Execute an UNWIND query once per chunk of items, all inside one transaction
+        
+        The chunks join the current bulk write if there is one; otherwise they share a
+        transaction of their own, so a failing chunk also rolls back the chunks before it.
+        
+        Args:
+            cypher_body: Cypher query unwinding the list parameter param_name
+            param_name: Name of the list parameter
+            items: Items to split across the chunks
+            columns: Column definitions of the cypher() result
+            chunk_size: Items per statement (defaults to Config.AGE_BATCH_SIZE)
+        
+        Returns:
+            Dictionary with success status and the result rows of each chunk
+        """
+        owns_transaction = getattr(self._local, 'conn', None) is None
+        if owns_transaction:
+            try:
+                self.begin_bulk()
+            except Exception as e:
+                return {"error": str(e)}
+        
+        chunk_rows = []
+        result = {"success": True}
+        for chunk in self._chunks(items, chunk_size):
+            result = self.execute_cypher_params(cypher_body, {param_name: chunk}, columns)
+            if not result.get("success"):
+                break
+            chunk_rows.append(result["result"])
+        
+        if owns_transaction:
+            ended = self.end_bulk(commit=bool(result.get("success")))
+            if result.get("success") and "error" in ended:
+                return ended
+        
+        if not result.get("success"):
+            return result
+        
+        return {"success": True, "result": chunk_rows}
+    
+    def execute_cypher_params(self, cypher_body, params, columns="result agtype", select="*"):
+        """
+        Execute a Cypher query that takes a parameter map
+        
+        AGE only accepts Cypher parameters as the argument of a prepared statement,
+        so the query is PREPAREd and then EXECUTEd with the JSON-encoded map.
+        
+        Prepared statements are kept to one transaction, which is also all a
+        transaction-pooling PgBouncer guarantees to run on one backend: a single
+        write deallocates its statement before committing, and a bulk write
+        prepares each query shape once and deallocates them all in end_bulk().
+        A bulk write keeps at most _STATEMENT_CACHE_SIZE shapes prepared. Failed
+        transactions deallocate their statements after the rollback; one that is
+        still left behind is found through pg_prepared_statements and reused.
+        
+        Args:
+            cypher_body: Cypher query referencing parameters as $name
+            params: Dictionary of parameter values
+            columns: Column definitions of the cypher() result, e.g. 'node agtype'
+            select: Select list applied to those columns, e.g. '(node::text)::bigint'
+        
+        Returns:
+            Dictionary with success status and result rows
+        """
+        if not self.age_enabled:
+            return {"error": "AGE is not enabled"}
+        
+        if not self.graph_name:
+            return {"error": "No graph selected"}
+        
+        statement_key = (self.graph_name, cypher_body, columns, select)
+        cached = self._statement_cache.get(statement_key)
+        if cached is None:
+            if len(self._statement_cache) >= _STATEMENT_CACHE_SIZE:
+                self._statement_cache.clear()
+            statement = f"SELECT {select} FROM cypher('{self.graph_name}', $$ {cypher_body} $$, $1) as ({columns})"
+            statement_name = f"age_{hashlib.sha1(statement.encode()).hexdigest()[:16]}"
+            cached = self._statement_cache[statement_key] = (statement_name, statement)
+        statement_name, statement = cached
+        
+        try:
+            with self._connection() as conn:
+                in_bulk = conn is getattr(self._local, 'conn', None)
+                prepared = self._local.prepared if in_bulk else set()
+                
+                # Talk to the driver cursor directly; SQLAlchemy's statement and
+                # result processing would cost more than the EXECUTE itself
+                with conn.connection.cursor() as cursor:
+                    if statement_name not in prepared:
+                        # Bound what a long bulk write keeps prepared on its backend
+                        if len(prepared) >= _STATEMENT_CACHE_SIZE:
+                            for old_name in prepared:
+                                cursor.execute(f"DEALLOCATE {old_name}")
+                            prepared.clear()
+                        cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (statement_name,))
+                        if cursor.fetchone() is None:
+                            cursor.execute(f"PREPARE {statement_name}(agtype) AS {statement}")
+                        prepared.add(statement_name)
+                    
+                    try:
+                        cursor.execute(f"EXECUTE {statement_name}(%s)", (orjson.dumps(params).decode(),))
+                        rows = cursor.fetchall()
+                    except Exception:
+                        # end_bulk() cleans up after a failed bulk write
+                        if not in_bulk:
+                            conn.rollback()
+                            self._discard_statements(conn, [statement_name])
+                        raise
+                    
+                    if not in_bulk:
+                        cursor.execute(f"DEALLOCATE {statement_name}")
+                
+                serializable_rows = [list(row) for row in rows]
+                
+                return {"success": True, "result": serializable_rows}
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def create_node(self, label, properties, return_id=False):
         """
         Create a node with the given label and properties
         
         Args:
             label: Node label (e.g., 'Person', 'Product')
             properties: Dictionary of properties
+            return_id: Return only the new node ID, cast to bigint server-side
         
         Returns:
-            Dictionary with success status and node info
+            Dictionary with success status and node info (or [[node_id]] if return_id)
         """
         if not self.age_enabled:
             return {"error": "AGE is not enabled"}
         
-        # Build properties string with proper type handling
-        props_list = []
-        for k, v in properties.items():
-            if isinstance(v, (int, float)):
-                props_list.append(f"{k}: {v}")
-            elif isinstance(v, bool):
-                props_list.append(f"{k}: {str(v).lower()}")
-            else:
-                # String values need quotes, escape single quotes
-                v_escaped = str(v).replace("'", "\\'") 
-                props_list.append(f"{k}: '{v_escaped}'")
-        props_str = ', '.join(props_list)
+        return_clause = "id(n)" if return_id else "n"
+        select_clause = "(node::text)::bigint" if return_id else "*"
         
-        cypher = f"""
-        SELECT * FROM cypher('{self.graph_name}', $$
+        cypher = self._cypher_template(('create_node', label, return_id), lambda: f"""
+            CREATE (n:{label} $props)
+            RETURN {return_clause}
+        """)
+        
+        return self.execute_cypher_params(cypher, {"props": properties}, "node agtype", select_clause)
+    
+    def create_nodes_batch(self, label, rows, return_id=False, chunk_size=None):
+        """
+        Create many nodes with the same label with one UNWIND per chunk of rows
+        
+        Args:
+            label: Node label (e.g., 'Person', 'Product')
+            rows: List of property dictionaries, all with the same keys
+            return_id: Return only the new node IDs, collected server-side into one row
+            chunk_size: Rows per UNWIND statement (defaults to Config.AGE_BATCH_SIZE)
+        
+        Returns:
+            Dictionary with success status and one created node per row
+            (or a flat list of node IDs if return_id, in the order of rows)
+        """
+        if not self.age_enabled:
+            return {"error": "AGE is not enabled"}
+        
+        if not rows:
+            return {"success": True, "result": []}
+        
+        # One agtype array decodes faster than one row per node. Cypher does not promise
+        # to keep the UNWIND order, so each ID is paired with the position of its row.
+        return_clause = "collect([row.i, id(n)])" if return_id else "n"
+        source = "row.p" if return_id else "row"
+        
+        def build():
+            props_str = ', '.join(f"{key}: {source}.{key}" for key in map(cypher_key, rows[0]))
+            return f"""
+            UNWIND $rows AS row
             CREATE (n:{label} {{{props_str}}})
-            RETURN n
-        $$) as (node agtype);
+            RETURN {return_clause}
         """
         
-        return self.execute_cypher(cypher)
+        cypher = self._cypher_template(('create_nodes_batch', label, tuple(rows[0]), return_id), build)
+        
+        items = [{"i": i, "p": row} for i, row in enumerate(rows)] if return_id else rows
+        result = self._execute_chunks(cypher, "rows", items, "node agtype", chunk_size)
+        if not result.get("success"):
+            return result
+        
+        if return_id:
+            created = [None] * len(rows)
+            for chunk_rows in result["result"]:
+                for i, node_id in parse_agtype(chunk_rows[0][0]):
+                    created[i] = node_id
+            return {"success": True, "result": created}
+        
+        return {"success": True, "result": [row for chunk_rows in result["result"] for row in chunk_rows]}
     
-    def create_edge(self, from_node_id, to_node_id, edge_label, properties=None):
+    def create_edge(self, from_node_id, to_node_id, edge_label, properties=None, return_id=False):
         """
         Create an edge between two nodes
         
@@ -87,38 +409,124 @@ class GraphUtils:
             to_node_id: Target node ID
             edge_label: Edge label (e.g., 'KNOWS', 'PURCHASED')
             properties: Optional dictionary of edge properties
+            return_id: Return only the new edge ID, cast to bigint server-side
         
         Returns:
-            Dictionary with success status and edge info
+            Dictionary with success status and edge info (or [[edge_id]] if return_id)
         """
         if not self.age_enabled:
             return {"error": "AGE is not enabled"}
         
-        props_str = ""
-        if properties:
-            # Build properties string with proper type handling
-            props_list = []
-            for k, v in properties.items():
-                if isinstance(v, (int, float)):
-                    props_list.append(f"{k}: {v}")
-                elif isinstance(v, bool):
-                    props_list.append(f"{k}: {str(v).lower()}")
-                else:
-                    # String values need quotes, escape single quotes
-                    v_escaped = str(v).replace("'", "\\'")
-                    props_list.append(f"{k}: '{v_escaped}'")
-            props_str = f" {{{', '.join(props_list)}}}"
+        return_clause = "id(r)" if return_id else "r"
+        select_clause = "(edge::text)::bigint" if return_id else "*"
         
-        cypher = f"""
-        SELECT * FROM cypher('{self.graph_name}', $$
+        cypher = self._cypher_template(('create_edge', edge_label, return_id), lambda: f"""
             MATCH (a), (b)
-            WHERE id(a) = {from_node_id} AND id(b) = {to_node_id}
-            CREATE (a)-[r:{edge_label}{props_str}]->(b)
-            RETURN r
-        $$) as (edge agtype);
+            WHERE id(a) = $from_id AND id(b) = $to_id
+            CREATE (a)-[r:{edge_label} $props]->(b)
+            RETURN {return_clause}
+        """)
+        
+        params = {"from_id": from_node_id, "to_id": to_node_id, "props": properties or {}}
+        return self.execute_cypher_params(cypher, params, "edge agtype", select_clause)
+    
+    def create_edges_batch(self, edge_label, pairs, merge=False, chunk_size=None):
         """
+        Create many edges with the same label with one UNWIND per chunk of pairs
         
-        return self.execute_cypher(cypher)
+        Args:
+            edge_label: Edge label (e.g., 'KNOWS', 'PURCHASED')
+            pairs: List of dictionaries with from_id, to_id and the edge properties,
+                   all with the same keys
+            merge: MERGE instead of CREATE, so an existing edge of this label between
+                   the same nodes is reused and its properties are overwritten
+            chunk_size: Pairs per UNWIND statement (defaults to Config.AGE_BATCH_SIZE)
+        
+        Returns:
+            Dictionary with success status and one edge ID per pair
+        """
+        if not self.age_enabled:
+            return {"error": "AGE is not enabled"}
+        
+        if not pairs:
+            return {"success": True, "result": []}
+        
+        def build():
+            keys = [key for key in map(cypher_key, pairs[0]) if key not in ('from_id', 'to_id')]
+            
+            if merge:
+                set_str = ', '.join(f"r.{key} = p.{key}" for key in keys)
+                write_clause = f"MERGE (a)-[r:{edge_label}]->(b)" + (f"\n            SET {set_str}" if keys else "")
+            else:
+                props_str = ', '.join(f"{key}: p.{key}" for key in keys)
+                write_clause = f"CREATE (a)-[r:{edge_label}" + (f" {{{props_str}}}" if keys else "") + "]->(b)"
+            
+            return f"""
+            UNWIND $pairs AS p
+            MATCH (a), (b)
+            WHERE id(a) = p.from_id AND id(b) = p.to_id
+            {write_clause}
+            RETURN id(r)
+        """
+        
+        cypher = self._cypher_template(('create_edges_batch', edge_label, tuple(pairs[0]), merge), build)
+        
+        result = self._execute_chunks(cypher, "pairs", pairs, "edge_id agtype", chunk_size)
+        if not result.get("success"):
+            return result
+        
+        return {"success": True, "result": [row for chunk_rows in result["result"] for row in chunk_rows]}
+    
+    def create_edges_parallel(self, edge_label, pairs, n_workers=8, max_retries=3, merge=False):
+        """
+        Create many edges with the same label from several connections at once
+        
+        Pairs are bucketed by their unordered endpoints, so every edge between two
+        given nodes is written by the same worker, which also keeps MERGE race-free.
+        Each worker writes its bucket in its own transaction (across all of its UNWIND
+        chunks) and retries it from a clean rollback after a deadlock or serialization failure.
+        
+        Args:
+            edge_label: Edge label (e.g., 'KNOWS', 'PURCHASED')
+            pairs: List of dictionaries with from_id, to_id and the edge properties,
+                   all with the same keys
+            n_workers: Number of concurrent connections
+            max_retries: Retries per bucket after a retryable error
+            merge: MERGE instead of CREATE, as in create_edges_batch
+        
+        Returns:
+            Dictionary with success status and one created edge ID per pair
+        """
+        if not self.age_enabled:
+            return {"error": "AGE is not enabled"}
+        
+        buckets = [[] for _ in range(n_workers)]
+        for pair in pairs:
+            endpoints = (min(pair['from_id'], pair['to_id']), max(pair['from_id'], pair['to_id']))
+            buckets[hash(endpoints) % n_workers].append(pair)
+        
+        graph_name = self.graph_name
+        
+        def write_bucket(bucket):
+            # Worker threads start without a selected graph
+            self.set_graph(graph_name)
+            for attempt in range(max_retries + 1):
+                result = self.create_edges_batch(edge_label, bucket, merge=merge)
+                if not any(error in result.get('error', '') for error in _RETRYABLE_ERRORS):
+                    break
+                # Back off only when another attempt follows
+                if attempt < max_retries:
+                    time.sleep(0.05 * (attempt + 1))
+            return result
+        
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(write_bucket, [bucket for bucket in buckets if bucket]))
+        
+        errors = [result['error'] for result in results if 'error' in result]
+        if errors:
+            return {"error": errors[0]}
+        
+        return {"success": True, "result": [row for result in results for row in result['result']]}
     
     def update_node(self, node_id, properties):
         """
@@ -134,28 +542,19 @@ class GraphUtils:
         if not self.age_enabled:
             return {"error": "AGE is not enabled"}
         
-        # Build SET clauses for properties with proper type handling
-        set_clauses = []
-        for k, v in properties.items():
-            if isinstance(v, (int, float)):
-                set_clauses.append(f"n.{k} = {v}")
-            elif isinstance(v, bool):
-                set_clauses.append(f"n.{k} = {str(v).lower()}")
-            else:
-                v_escaped = str(v).replace("'", "\\'")
-                set_clauses.append(f"n.{k} = '{v_escaped}'")
-        set_clauses_str = ', '.join(set_clauses)
-        
-        cypher = f"""
-        SELECT * FROM cypher('{self.graph_name}', $$
+        # Only the property keys are part of the query text; the values are parameters
+        def build():
+            set_clauses_str = ', '.join(f"n.{key} = $props.{key}" for key in map(cypher_key, properties))
+            return f"""
             MATCH (n)
-            WHERE id(n) = {node_id}
+            WHERE id(n) = $id
             SET {set_clauses_str}
             RETURN n
-        $$) as (node agtype);
         """
         
-        return self.execute_cypher(cypher)
+        cypher = self._cypher_template(('update_node', tuple(properties)), build)
+        
+        return self.execute_cypher_params(cypher, {"id": node_id, "props": properties}, "node agtype")
     
     def update_edge(self, edge_id, properties):
         """
@@ -171,28 +570,19 @@ class GraphUtils:
         if not self.age_enabled:
             return {"error": "AGE is not enabled"}
         
-        # Build SET clauses for properties with proper type handling
-        set_clauses = []
-        for k, v in properties.items():
-            if isinstance(v, (int, float)):
-                set_clauses.append(f"r.{k} = {v}")
-            elif isinstance(v, bool):
-                set_clauses.append(f"r.{k} = {str(v).lower()}")
-            else:
-                v_escaped = str(v).replace("'", "\\'")
-                set_clauses.append(f"r.{k} = '{v_escaped}'")
-        set_clauses_str = ', '.join(set_clauses)
-        
-        cypher = f"""
-        SELECT * FROM cypher('{self.graph_name}', $$
+        # Only the property keys are part of the query text; the values are parameters
+        def build():
+            set_clauses_str = ', '.join(f"r.{key} = $props.{key}" for key in map(cypher_key, properties))
+            return f"""
             MATCH ()-[r]->()
-            WHERE id(r) = {edge_id}
+            WHERE id(r) = $id
             SET {set_clauses_str}
             RETURN r
-        $$) as (edge agtype);
         """
         
-        return self.execute_cypher(cypher)
+        cypher = self._cypher_template(('update_edge', tuple(properties)), build)
+        
+        return self.execute_cypher_params(cypher, {"id": edge_id, "props": properties}, "edge agtype")
     
     def delete_node(self, node_id):
         """
@@ -321,12 +711,7 @@ class GraphUtils:
         
         # Extract node IDs from the result
         try:
-            import json
-            node_ids = []
-            for node in nodes:
-                node_str = node[0].split('::')[0].strip()
-                node_data = json.loads(node_str)
-                node_ids.append(node_data['id'])
+            node_ids = [parse_agtype(node[0])['id'] for node in nodes]
             
             # Get only edges between these nodes
             if node_ids:
@@ -409,6 +794,69 @@ class GraphUtils:
                 return {"error": f"Graph '{graph_name}' already exists"}
             return {"error": str(e)}
     
+    def create_label_indexes(self, vertex_labels=(), edge_labels=()):
+        """
+        Create label tables ahead of an ingest and index their ID columns
+        
+        AGE creates a label table on first write without any index. The
+        start_id/end_id indexes on edge tables serve traversals and MERGE's check
+        for an existing edge, which compare those columns directly. Whether a
+        Cypher id(n) = ... filter can use the id index depends on how the AGE
+        version plans age_id() over the rebuilt vertex, so check it with EXPLAIN
+        on the target server. create_graph_indexes.py only covers the
+        _ag_label_vertex/_ag_label_edge parent tables, not these label tables.
+        
+        Args:
+            vertex_labels: Vertex labels to prepare (e.g., ['Person', 'Company'])
+            edge_labels: Edge labels to prepare (e.g., ['KNOWS'])
+        
+        Returns:
+            Dictionary with success status
+        """
+        if not self.age_enabled:
+            return {"error": "AGE is not enabled"}
+        
+        if not self.graph_name:
+            return {"error": "No graph selected"}
+        
+        label_specs = [(label, 'create_vlabel', ('id',)) for label in vertex_labels]
+        label_specs += [(label, 'create_elabel', ('id', 'start_id', 'end_id')) for label in edge_labels]
+        
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SET search_path = ag_catalog, '$user', public;"))
+                
+                result = conn.execute(text("""
+                    SELECT l.name FROM ag_label l
+                    JOIN ag_graph g ON l.graph = g.graphid
+                    WHERE g.name = :graph_name
+                """), {"graph_name": self.graph_name})
+                existing_labels = {row[0] for row in result.fetchall()}
+                
+                for label, create_function, columns in label_specs:
+                    if label not in existing_labels:
+                        conn.execute(text(f"SELECT {create_function}(:graph_name, :label);"),
+                                     {"graph_name": self.graph_name, "label": label})
+                    for column in columns:
+                        conn.execute(text(f"""
+                            CREATE INDEX IF NOT EXISTS "{label}_{column}_btree_idx"
+                            ON "{self.graph_name}"."{label}" USING BTREE ({column});
+                        """))
+                conn.commit()
+                return {"success": True, "message": f"Indexed {len(label_specs)} labels in '{self.graph_name}'"}
+        except Exception as e:
+            return {"error": str(e)}
+    
     def set_graph(self, graph_name):
-        """Set the active graph name"""
-        self.graph_name = graph_name
+        """
+        Set the active graph name for the current thread
+        
+        The selection is thread-local so concurrent requests sharing one instance
+        cannot switch each other's graph. Other threads (e.g. a script's own thread
+        pool) do not see it: they fall back to the graph_name passed to the
+        constructor and must call set_graph() themselves otherwise.
+        
+        Args:
+            graph_name: Name of the graph to use
+        """
+        self._local.graph_name = graph_name
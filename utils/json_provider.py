@@ -0,0 +1,34 @@
+"""
+Flask JSON provider backed by orjson for faster serialization of large graph payloads
+"""
+import decimal
+import orjson
+from flask.json.provider import JSONProvider
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _default(obj):
+    """Serialize the types orjson does not handle natively"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider using orjson, used by jsonify() and request.json"""
+    
+    def dumps(self, obj, **kwargs):
+        option = OPTIONS | orjson.OPT_SORT_KEYS if kwargs.get('sort_keys') else OPTIONS
+        return orjson.dumps(obj, default=_default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=OPTIONS),
+            mimetype='application/json'
+        )
@@ -2,60 +2,67 @@
 OpenAI helper for translating natural language to Cypher queries
 Supports both Azure OpenAI and standard OpenAI
 """
+import asyncio
+import hashlib
+import io
 import os
-from openai import AzureOpenAI, OpenAI
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+import httpx
+import jsonschema
+import orjson
+from openai import AzureOpenAI, AsyncAzureOpenAI, OpenAI
+from utils.graph_utils import parse_agtype
 
-class OpenAIHelper:
-    """Helper class for OpenAI integration"""
-    
-    def __init__(self, azure_endpoint=None, azure_api_key=None, azure_deployment=None, azure_api_version=None, graph_utils=None):
-        """
-        Initialize OpenAI helper with Azure OpenAI configuration
-        
-        Args:
-            azure_endpoint: Azure OpenAI endpoint URL
-            azure_api_key: Azure OpenAI API key
-            azure_deployment: Azure OpenAI deployment name
-            azure_api_version: Azure OpenAI API version
-            graph_utils: GraphUtils instance for accessing graph data
-        """
-        self.azure_endpoint = azure_endpoint or os.getenv('AZURE_OPENAI_ENDPOINT')
-        self.azure_api_key = azure_api_key or os.getenv('AZURE_OPENAI_API_KEY')
-        self.azure_deployment = azure_deployment or os.getenv('AZURE_OPENAI_DEPLOYMENT', 'gpt-4o')
-        self.azure_api_version = azure_api_version or os.getenv('AZURE_OPENAI_API_VERSION', '2024-08-01-preview')
-        self.graph_utils = graph_utils
-        
-        if not self.azure_endpoint or not self.azure_api_key:
-            raise ValueError("Azure OpenAI endpoint and API key are required")
-        
-        # Initialize Azure OpenAI client
-        self.client = AzureOpenAI(
-            azure_endpoint=self.azure_endpoint,
-            api_key=self.azure_api_key,
-            api_version=self.azure_api_version
-        )
-        self.is_azure = True
-    
-    def natural_language_to_cypher(self, natural_query, graph_schema=None, graph_name=None):
-        """
-        Convert natural language query to Apache AGE SQL
-        
-        Args:
-            natural_query: The natural language query from user
-            graph_schema: Optional schema information about the graph
-            graph_name: Name of the graph for the query
-        
-        Returns:
-            Dictionary with cypher query and explanation
-        """
-        schema_context = ""
-        if graph_schema:
-            schema_context = f"\n\nGraph Schema Information:\n{graph_schema}"
-        
-        if graph_name:
-            schema_context += f"\n\nCurrent Graph Name: {graph_name}\nUSE THIS GRAPH NAME in your query."
-        
-        system_prompt = f"""You are an expert in converting natural language queries to Apache AGE SQL queries for PostgreSQL.
+# Bump whenever the prompt or response handling changes, so cached translations are not reused
+PROMPT_VERSION = "v3"
+
+# Deterministic sampling so a repeated question gets the same Cypher and the response cache stays valid
+MODEL_TEMPERATURE = 0.0
+MODEL_SEED = 42
+
+# Number of translations kept in the in-process response cache
+RESPONSE_CACHE_SIZE = 256
+
+# Seconds a generated schema summary is reused before the graph is read again
+SCHEMA_CACHE_TTL = 60.0
+
+# Nodes/edges inspected per schema summary; a fixed seed keeps the sample (and summary text) stable
+SCHEMA_SAMPLE_SIZE = 50
+SCHEMA_SAMPLE_SEED = 0
+
+# Pool for the shared sync client: kept-alive HTTP/2 connections avoid a TCP/TLS handshake per request
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Shape of the model's answer, enforced server-side through structured outputs and re-checked locally.
+# Strict mode requires every property to be listed as required; "assumptions" may be an empty string.
+_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "cypher": {"type": "string"},
+        "explanation": {"type": "string"},
+        "assumptions": {"type": "string"}
+    },
+    "required": ["cypher", "explanation", "assumptions"],
+    "additionalProperties": False
+}
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "cypher_translation", "strict": True, "schema": _RESPONSE_SCHEMA}
+}
+# Building a validator is the costly part, so it is done once
+_RESPONSE_VALIDATOR = jsonschema.Draft202012Validator(_RESPONSE_SCHEMA)
+
+# Batch job states after which polling stops
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# The instructions never change, so they are sent as their own first message and
+# the per-request schema/graph context follows in a second one. The byte-identical
+# prefix lets the service's prompt caching reuse it across requests and graph edits.
+_SYSTEM_PROMPT = """You are an expert in converting natural language queries to Apache AGE SQL queries for PostgreSQL.
 
 ⚠️ ABSOLUTE PROHIBITION - THESE WILL CAUSE SYNTAX ERRORS:
 1. NEVER EVER use pipe | in relationship patterns: [:TYPE1|TYPE2] ❌ FORBIDDEN ❌
@@ -69,7 +76,7 @@ When you need to match FRIENDS OR COWORKER or any multiple types:
 - ✅ CORRECT: MATCH (a)-[r]-(b) WHERE type(r) IN ['FRIENDS', 'COWORKER']
 
 Full example matching friends or coworkers:
-MATCH (person:Person {{name: 'John'}})-[r]-(other:Person)
+MATCH (person:Person {name: 'John'})-[r]-(other:Person)
 WHERE type(r) IN ['FRIENDS', 'COWORKER']
 RETURN other
 
@@ -103,8 +110,7 @@ Examples of CORRECT queries:
 - Find nodes: SELECT * FROM cypher('graph_name', $$ MATCH (n) RETURN n LIMIT 10 $$) AS (node agtype);
 - Multiple relationship types: SELECT * FROM cypher('graph_name', $$ MATCH (a:Person)-[r]-(b:Person) WHERE type(r) IN ['FRIENDS', 'COWORKER'] RETURN b LIMIT 10 $$) AS (person agtype);
 - Nodes with connections: SELECT * FROM cypher('graph_name', $$ MATCH (n)-[r]-() WITH n, count(r) as connections WHERE connections > 2 RETURN n, connections $$) AS (node agtype, connections agtype);
-- Shortest path: SELECT * FROM cypher('graph_name', $$ MATCH paths = (a:City {{name: 'A'}})-[r*1..6]-(b:City {{name: 'B'}}) WITH paths, relationships(paths) AS rels UNWIND rels AS rel WITH nodes(paths) AS nodes, sum(rel.time) AS totalTime RETURN nodes, totalTime ORDER BY totalTime LIMIT 5 $$) AS (nodes agtype, totalTime agtype);
-{schema_context}
+- Shortest path: SELECT * FROM cypher('graph_name', $$ MATCH paths = (a:City {name: 'A'})-[r*1..6]-(b:City {name: 'B'}) WITH paths, relationships(paths) AS rels UNWIND rels AS rel WITH nodes(paths) AS nodes, sum(rel.time) AS totalTime RETURN nodes, totalTime ORDER BY totalTime LIMIT 5 $$) AS (nodes agtype, totalTime agtype);
 
 Respond with a JSON object containing:
 1. "cypher": The COMPLETE AGE SQL query (including SELECT wrapper and column definitions)
@@ -112,31 +118,367 @@ Respond with a JSON object containing:
 3. "assumptions": Any assumptions made (if applicable)
 
 Example response format:
-{{
+{
     "cypher": "SELECT * FROM cypher('graph_name', $$ MATCH (n:Person) WHERE n.age > 25 RETURN n $$) AS (person agtype);",
     "explanation": "This query finds all Person nodes where age is greater than 25",
     "assumptions": "Assumed you want all matching persons"
-}}"""
+}"""
+
+def _sample_rows(rows, size=SCHEMA_SAMPLE_SIZE):
+    """Pick up to size rows spread over the whole result instead of only its first rows"""
+    if len(rows) <= size:
+        return rows
+    return random.Random(SCHEMA_SAMPLE_SEED).sample(rows, size)
 
+class OpenAIHelper:
+    """Helper class for OpenAI integration"""
+    
+    def __init__(self, azure_endpoint=None, azure_api_key=None, azure_deployment=None, azure_api_version=None, graph_utils=None):
+        """
+        Initialize OpenAI helper with Azure OpenAI configuration
+        
+        Args:
+            azure_endpoint: Azure OpenAI endpoint URL
+            azure_api_key: Azure OpenAI API key
+            azure_deployment: Azure OpenAI deployment name
+            azure_api_version: Azure OpenAI API version
+            graph_utils: GraphUtils instance for accessing graph data
+        """
+        self.azure_endpoint = azure_endpoint or os.getenv('AZURE_OPENAI_ENDPOINT')
+        self.azure_api_key = azure_api_key or os.getenv('AZURE_OPENAI_API_KEY')
+        self.azure_deployment = azure_deployment or os.getenv('AZURE_OPENAI_DEPLOYMENT', 'gpt-4o')
+        self.azure_api_version = azure_api_version or os.getenv('AZURE_OPENAI_API_VERSION', '2024-08-01-preview')
+        self.graph_utils = graph_utils
+        
+        if not self.azure_endpoint or not self.azure_api_key:
+            raise ValueError("Azure OpenAI endpoint and API key are required")
+        
+        # Initialize Azure OpenAI client on a pooled HTTP/2 connection; http2 and limits go on the
+        # transport because httpx ignores the client-level ones when a transport is given
+        self.http_client = httpx.Client(
+            transport=httpx.HTTPTransport(http2=True, limits=HTTP_LIMITS, retries=2),
+            timeout=HTTP_TIMEOUT
+        )
+        self.client = AzureOpenAI(
+            azure_endpoint=self.azure_endpoint,
+            api_key=self.azure_api_key,
+            api_version=self.azure_api_version,
+            http_client=self.http_client
+        )
+        self.is_azure = True
+        
+        # Exact-match LRU cache of translations; the lock covers concurrent requests
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Backend configuration reported with the last response; part of the cache key
+        self._system_fingerprint = None
+        
+        # Schema summaries per graph as (generated_at, schema), dropped on TTL expiry or invalidation
+        self._schema_cache = {}
+        self._schema_ttl = SCHEMA_CACHE_TTL
+    
+    def _async_client(self):
+        """Create an Azure OpenAI client for use with asyncio"""
+        return AsyncAzureOpenAI(
+            azure_endpoint=self.azure_endpoint,
+            api_key=self.azure_api_key,
+            api_version=self.azure_api_version
+        )
+    
+    def _cache_key(self, natural_query, graph_schema, graph_name):
+        """Key a translation by prompt version, model fingerprint, query, graph and a digest of the schema"""
+        schema_digest = hashlib.sha256((graph_schema or "").encode()).hexdigest()
+        key = "|".join((PROMPT_VERSION, self._system_fingerprint or "", natural_query, graph_name or "", schema_digest))
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    def _cache_get(self, key):
+        """Return a cached translation (marking it recently used), or None"""
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+    
+    def _note_fingerprint(self, response):
+        """Track the response's system_fingerprint; entries keyed by an older one age out through LRU eviction"""
+        fingerprint = getattr(response, "system_fingerprint", None)
+        if fingerprint:
+            self._system_fingerprint = fingerprint
+    
+    def _cache_put(self, key, result):
+        """Store a successful translation, evicting the least recently used one when full"""
+        if not result.get("success"):
+            return
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _build_messages(self, natural_query, graph_schema=None, graph_name=None):
+        """
+        Build the chat messages for a natural language to AGE SQL translation
+        
+        Args:
+            natural_query: The natural language query from user
+            graph_schema: Optional schema information about the graph
+            graph_name: Name of the graph for the query
+        
+        Returns:
+            List of chat messages (static instructions, schema context when known, user query)
+        """
+        messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
+        
+        schema_context = []
+        if graph_schema:
+            schema_context.append(f"Graph Schema Information:\n{graph_schema}")
+        
+        if graph_name:
+            schema_context.append(f"Current Graph Name: {graph_name}\nUSE THIS GRAPH NAME in your query.")
+        
+        if schema_context:
+            messages.append({"role": "system", "content": "\n\n".join(schema_context)})
+        
+        messages.append({"role": "user", "content": natural_query})
+        return messages
+    
+    def _parse_response(self, response):
+        """Convert a chat completion into the translation result dictionary"""
+        return self._parse_content(response.choices[0].message.content)
+    
+    def _parse_content(self, content):
+        """Convert the model's JSON message content into the translation result dictionary"""
+        result = orjson.loads(content)
+        error = jsonschema.exceptions.best_match(_RESPONSE_VALIDATOR.iter_errors(result))
+        if error is not None:
+            raise ValueError(f"Invalid model response: {error.message}")
+        
+        return {
+            "success": True,
+            "cypher": result.get("cypher", ""),
+            "explanation": result.get("explanation", ""),
+            "assumptions": result.get("assumptions", "")
+        }
+    
+    def natural_language_to_cypher(self, natural_query, graph_schema=None, graph_name=None):
+        """
+        Convert natural language query to Apache AGE SQL
+        
+        Args:
+            natural_query: The natural language query from user
+            graph_schema: Optional schema information about the graph
+            graph_name: Name of the graph for the query
+        
+        Returns:
+            Dictionary with cypher query and explanation
+        """
+        cached = self._cache_get(self._cache_key(natural_query, graph_schema, graph_name))
+        if cached is not None:
+            return dict(cached)
+        
         try:
             response = self.client.chat.completions.create(
                 model=self.azure_deployment if self.is_azure else "gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": natural_query}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.3
+                messages=self._build_messages(natural_query, graph_schema, graph_name),
+                response_format=_RESPONSE_FORMAT,
+                temperature=MODEL_TEMPERATURE,
+                seed=MODEL_SEED
             )
             
-            import json
-            result = json.loads(response.choices[0].message.content)
+            result = self._parse_response(response)
+            # Keyed after noting the fingerprint, which this response may have changed
+            self._note_fingerprint(response)
+            self._cache_put(self._cache_key(natural_query, graph_schema, graph_name), result)
+            return dict(result)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def natural_language_to_cypher_stream(self, natural_query, graph_schema=None, graph_name=None):
+        """
+        Stream the raw JSON answer for a translation as it is generated
+        
+        The caller joins the chunks and parses the result (see _parse_content) once the stream ends.
+        
+        Args:
+            natural_query: The natural language query from user
+            graph_schema: Optional schema information about the graph
+            graph_name: Name of the graph for the query
+        
+        Yields:
+            Text fragments of the JSON response
+        """
+        stream = self.client.chat.completions.create(
+            model=self.azure_deployment if self.is_azure else "gpt-4o",
+            messages=self._build_messages(natural_query, graph_schema, graph_name),
+            response_format=_RESPONSE_FORMAT,
+            temperature=MODEL_TEMPERATURE,
+            seed=MODEL_SEED,
+            stream=True
+        )
+        
+        for chunk in stream:
+            # Azure sends content filter results as chunks without choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _translate_async(self, client, natural_query, graph_schema=None, graph_name=None):
+        """Translate one query with an already open async client, going through the response cache"""
+        cached = self._cache_get(self._cache_key(natural_query, graph_schema, graph_name))
+        if cached is not None:
+            return dict(cached)
+        
+        try:
+            response = await client.chat.completions.create(
+                model=self.azure_deployment if self.is_azure else "gpt-4o",
+                messages=self._build_messages(natural_query, graph_schema, graph_name),
+                response_format=_RESPONSE_FORMAT,
+                temperature=MODEL_TEMPERATURE,
+                seed=MODEL_SEED
+            )
+            
+            result = self._parse_response(response)
+            # Keyed after noting the fingerprint, which this response may have changed
+            self._note_fingerprint(response)
+            self._cache_put(self._cache_key(natural_query, graph_schema, graph_name), result)
+            return dict(result)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def natural_language_to_cypher_batch(self, queries, graph_schema=None, graph_name=None, max_concurrency=10):
+        """
+        Translate several natural language queries concurrently
+        
+        Requests share one async client and at most max_concurrency of them are in flight at once,
+        so the batch takes roughly one round-trip per max_concurrency queries instead of one per query.
+        
+        Args:
+            queries: List of natural language queries
+            graph_schema: Optional schema information about the graph
+            graph_name: Name of the graph for the queries
+            max_concurrency: Maximum number of simultaneous requests
+        
+        Returns:
+            List of result dictionaries, in the same order as queries
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        try:
+            async with self._async_client() as client:
+                async def translate(natural_query):
+                    async with semaphore:
+                        return await self._translate_async(client, natural_query, graph_schema, graph_name)
+                
+                return await asyncio.gather(*(translate(query) for query in queries))
+        except Exception as e:
+            return [{"success": False, "error": str(e)} for _ in queries]
+    
+    def submit_batch(self, queries, graph_schema=None, graph_name=None):
+        """
+        Submit queries as an offline Batch API job, for bulk translations that can wait
+        
+        Batch jobs are billed at a discount and use a separate rate limit from chat completions.
+        The deployment must be a batch (Global Batch) deployment.
+        
+        Args:
+            queries: List of natural language queries
+            graph_schema: Optional schema information about the graph
+            graph_name: Name of the graph for the queries
+        
+        Returns:
+            Dictionary with the batch id, to be passed to retrieve_batch
+        """
+        try:
+            buffer = io.BytesIO()
+            for i, natural_query in enumerate(queries):
+                line = {
+                    "custom_id": f"q-{i}",
+                    "method": "POST",
+                    "url": "/chat/completions",
+                    "body": {
+                        "model": self.azure_deployment if self.is_azure else "gpt-4o",
+                        "messages": self._build_messages(natural_query, graph_schema, graph_name),
+                        "response_format": _RESPONSE_FORMAT,
+                        "temperature": MODEL_TEMPERATURE,
+                        "seed": MODEL_SEED
+                    }
+                }
+                buffer.write(orjson.dumps(line) + b"\n")
+            buffer.seek(0)
+            
+            input_file = self.client.files.create(file=("batch.jsonl", buffer), purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/chat/completions",
+                completion_window="24h"
+            )
+            
+            return {"success": True, "batch_id": batch.id}
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def retrieve_batch(self, batch_id, poll_interval=10, timeout=None):
+        """
+        Wait for a batch submitted with submit_batch and collect its translations
+        
+        Successful requests are read from the batch's output file and failed ones from its
+        error file. Jobs that expired or were cancelled still return the requests they finished.
+        
+        Args:
+            batch_id: Id returned by submit_batch
+            poll_interval: Seconds between status checks
+            timeout: Maximum seconds to wait, or None to wait until the job ends
+        
+        Returns:
+            Dictionary with the final batch status and one result per submitted query, in
+            submission order; queries without an answer get an error result
+        """
+        try:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            batch = self.client.batches.retrieve(batch_id)
+            while batch.status not in BATCH_TERMINAL_STATUSES:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return {"success": False, "error": f"Batch {batch_id} still {batch.status}"}
+                time.sleep(poll_interval)
+                batch = self.client.batches.retrieve(batch_id)
+            
+            file_ids = [file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id]
+            if not file_ids:
+                return {"success": False, "error": f"Batch {batch_id} ended as {batch.status}"}
+            
+            # Results are keyed by the custom_id index, since the files are not in submission order
+            results = {}
+            for file_id in file_ids:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if not line.strip():
+                        continue
+                    item = orjson.loads(line)
+                    index = int(item["custom_id"].split("-", 1)[1])
+                    response = item.get("response") or {}
+                    try:
+                        if item.get("error") or response.get("status_code") != 200:
+                            raise ValueError(item.get("error") or response.get("body"))
+                        content = response["body"]["choices"][0]["message"]["content"]
+                        results[index] = self._parse_content(content)
+                    except Exception as e:
+                        results[index] = {"success": False, "error": str(e)}
+            
+            counts = getattr(batch, "request_counts", None)
+            total = max(getattr(counts, "total", 0) or 0, max(results, default=-1) + 1)
+            missing = {"success": False, "error": f"No result returned (batch {batch.status})"}
             
             return {
                 "success": True,
-                "cypher": result.get("cypher", ""),
-                "explanation": result.get("explanation", ""),
-                "assumptions": result.get("assumptions", "")
+                "status": batch.status,
+                "results": [results.get(index, dict(missing)) for index in range(total)]
             }
         except Exception as e:
             return {
@@ -144,20 +486,41 @@ Example response format:
                 "error": str(e)
             }
     
-    def get_graph_schema_summary(self):
+    def invalidate_schema_cache(self, graph_name=None):
+        """
+        Drop cached schema summaries, e.g. after a CREATE/DELETE changed the graph
+        
+        Args:
+            graph_name: Graph whose summary to drop; all graphs when None
+        """
+        if graph_name is None:
+            self._schema_cache.clear()
+        else:
+            self._schema_cache.pop(graph_name, None)
+    
+    def get_graph_schema_summary(self, use_cache=True):
         """
         Generate a summary of the graph schema for context by loading data from the graph
         
+        The per-graph TTL cache is meant for direct library use. Callers with their own
+        invalidation (the web app memoizes summaries per catalog version) pass use_cache=False.
+        
+        Args:
+            use_cache: Reuse and store summaries in the helper's TTL cache
+        
         Returns:
             String summary of the graph schema
         """
         try:
-            import json
-            
             # Load graph data using graph_utils
             if not self.graph_utils:
                 return "Error: GraphUtils not configured"
             
+            graph_name = self.graph_utils.graph_name
+            cached = self._schema_cache.get(graph_name) if use_cache else None
+            if cached and time.monotonic() - cached[0] < self._schema_ttl:
+                return cached[1]
+            
             graph_data = self.graph_utils.get_graph_data()
             
             if "error" in graph_data:
@@ -167,48 +530,50 @@ Example response format:
             edges = graph_data.get('edges', [])
             
             # Extract unique node labels and properties
-            node_labels = {}
-            for node in nodes[:50]:  # Sample first 50 nodes
+            node_labels = defaultdict(set)
+            for node in _sample_rows(nodes):
+                # Vertices are JSON objects; skip anything else without raising
+                if not node or not node[0] or node[0][0] != '{':
+                    continue
                 try:
-                    node_str = node[0].split('::')[0].strip()
-                    node_data = json.loads(node_str)
-                    label = node_data.get('label', 'Unknown')
-                    properties = node_data.get('properties', {})
-                    
-                    if label not in node_labels:
-                        node_labels[label] = set()
-                    node_labels[label].update(properties.keys())
-                except:
+                    node_data = parse_agtype(node[0])
+                    node_labels[node_data.get('label', 'Unknown')].update(node_data.get('properties', {}))
+                except (ValueError, KeyError, IndexError, AttributeError, TypeError):
                     continue
             
             # Extract unique edge labels and properties
-            edge_labels = {}
-            for edge in edges[:50]:  # Sample first 50 edges
+            edge_labels = defaultdict(set)
+            for edge in _sample_rows(edges):
                 try:
                     # Edges are returned as [from_node, edge, to_node]
                     # We need the edge which is at index 1
-                    edge_str = edge[1].split('::')[0].strip()
-                    edge_data = json.loads(edge_str)
-                    label = edge_data.get('label', 'Unknown')
-                    properties = edge_data.get('properties', {})
-                    
-                    if label not in edge_labels:
-                        edge_labels[label] = set()
-                    edge_labels[label].update(properties.keys())
-                except Exception as e:
+                    if not edge[1] or edge[1][0] != '{':
+                        continue
+                    edge_data = parse_agtype(edge[1])
+                    edge_labels[edge_data.get('label', 'Unknown')].update(edge_data.get('properties', {}))
+                except (ValueError, KeyError, IndexError, AttributeError, TypeError):
                     # Skip edges that can't be parsed
                     continue
             
+            # Sort and join each label's property names once
+            node_summary = {label: ", ".join(sorted(props)) for label, props in node_labels.items()}
+            edge_summary = {label: ", ".join(sorted(props)) for label, props in edge_labels.items()}
+            
             # Build schema summary
-            schema = "Node Types:\n"
-            for label, props in node_labels.items():
-                schema += f"  - {label}: properties = {{{', '.join(sorted(props))}}}\n"
+            parts = ["Node Types:"]
+            for label, props_str in node_summary.items():
+                parts.append(f"  - {label}: properties = {{{props_str}}}")
+            
+            parts.extend(("", "Relationship Types:"))
+            for label, props_str in edge_summary.items():
+                parts.append(f"  - {label}: properties = {{{props_str}}}" if props_str else f"  - {label}")
             
-            schema += "\nRelationship Types:\n"
-            for label, props in edge_labels.items():
-                props_str = f": properties = {{{', '.join(sorted(props))}}}" if props else ""
-                schema += f"  - {label}{props_str}\n"
+            # The trailing empty part keeps the final newline
+            parts.append("")
+            schema = "\n".join(parts)
             
+            if use_cache:
+                self._schema_cache[graph_name] = (time.monotonic(), schema)
             return schema
         except Exception as e:
             return f"Error generating schema: {str(e)}"
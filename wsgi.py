@@ -0,0 +1,17 @@
+"""
+WSGI entry point for serving the Flask application with gunicorn gevent workers
+
+    gunicorn -k gevent -w 4 --worker-connections=1000 wsgi:app
+
+With more than one worker, set CACHE_TYPE=RedisCache and CACHE_REDIS_URL so every
+worker sees the same cached graph list, schema and catalog versions; the default
+SimpleCache is per process and a write only invalidates the worker that handled it.
+"""
+# Patch blocking I/O before anything else imports socket/ssl/psycopg2
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from app import app